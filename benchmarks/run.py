@@ -0,0 +1,251 @@
+from __future__ import annotations
+import json
+import platform
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy as np
+from src.datastructures import Plot, FunctionPlot, LinearPlot, Range, ReflectedPlot, Segment, create_functions
+from src.formula import FormulaError, compile_formula
+from src.plots import DynamicPlot
+from src.problem import Problem
+from src.solver import extend_plot
+
+
+SEGMENTS = [10, 100, 1_000, 10_000, 100_000]
+LEGACY_SEGMENTS = 10_000
+RANGES = [10, 100, 1_000]
+MIN_TIME = 0.2
+MAX_REPEATS = 1_000
+POINTS = 10_000
+CALLS = 1_000
+THRESHOLD = 1.25
+DOMAIN = (-5.0, 5.0)
+CROSSCHECK_T = [0.0, 1.0, 5.0, 10.0, 20.0]
+CROSSCHECK_TOLERANCE = 1e-3
+CROSSCHECK_CONSTRAINTS = [(None, None), (['odd', -3], ['odd', 3]), (['odd', -3], ['even', 3]), (['even', -3], ['even', 3])]
+# Utt = Uxx + 1 with zero data on [0, 3], Dirichlet at 0 and Dirichlet or Neumann at 3, has a sine series solution
+CROSSCHECK_SOURCE_CONSTRAINTS = [(['odd', 0], ['odd', 3]), (['odd', 0], ['even', 3])]
+CROSSCHECK_MODES = 2000
+CHECK_TOLERANCE = 1e-12
+# formulas that have to be rejected: a ufunc would write into its second argument, min needs two
+CHECK_BAD_FORMULAS = ['sin(x, x)', 'exp(x, x)', 'min(x)', 'max(x, 1, 2)', 'heaviside()']
+CHECK_FORMULAS = ['heaviside(x, 1)', 'atan2(x, 1)', 'max(x, 0)']
+
+
+def measure(function: Callable[[], Any], min_time: float = MIN_TIME) -> dict[str, float]:
+    # repeats until min_time has been spent (at least twice, so the first call's warm-up is not the only sample)
+    times, total = [], 0.0
+    while (total < min_time or len(times) < 2) and len(times) < MAX_REPEATS:
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        total += times[-1]
+    return {'best': min(times), 'mean': total / len(times), 'repeats': len(times)}
+
+
+def linear_plot(segments: int, seed: int = 0) -> LinearPlot:
+    rng = np.random.default_rng(seed)
+    return LinearPlot(np.linspace(*DOMAIN, segments + 1), rng.uniform(-1, 1, segments + 1))
+
+
+def legacy_plot(segments: int, seed: int = 0) -> Plot:
+    plot = linear_plot(segments, seed)
+    return Plot([Segment(plot.x[i], plot.x[i + 1], create_functions(plot.x[i], plot.x[i + 1], plot.y[i], plot.y[i + 1]))
+                 for i in range(segments)])
+
+
+def cases(plot: Plot, other: Plot, plot_range: Range, ax) -> dict[str, Callable[[], Any]]:
+    points = np.linspace(plot_range.x0, plot_range.x1, POINTS)
+    scalars = np.random.default_rng(1).uniform(plot_range.x0, plot_range.x1, CALLS).tolist()
+    constraints = ('odd', DOMAIN[0]), ('even', DOMAIN[1])
+    dynamic = DynamicPlot(ax, plot)
+
+    def product() -> list[float]:
+        # the product is only useful if it can be evaluated, so its sampling is part of the case
+        result = plot * other
+        return [result(x) for x in scalars]
+
+    return {
+        'Plot.__call__ (scalar)': lambda: [plot(x) for x in scalars],
+        'Plot.__call__ (array)': lambda: plot(points),
+        'Plot.__add__': lambda: plot + other,
+        'Plot.__mul__': product,
+        'Plot._split': lambda: plot._split(other),
+        'Plot.integrate': lambda: plot.integrate(),
+        'Plot.shift': lambda: plot.shift(1.5),
+        'Window._extend_plot': lambda: extend_plot(plot, *constraints).evaluate(points),
+        'DynamicPlot.refresh': lambda: dynamic.refresh(plot_range, a=1.0, t=2.5),
+    }
+
+
+def run(segments: list[int], ranges: list[float], legacy_segments: int = LEGACY_SEGMENTS,
+        min_time: float = MIN_TIME, only: Optional[list[str]] = None) -> list[dict[str, Any]]:
+    figure = Figure(figsize=(8, 4.5), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    results = []
+    for kind, build in (('linear', linear_plot), ('segments', legacy_plot)):
+        for count in segments:
+            if kind == 'segments' and count > legacy_segments: continue
+            plot, other = build(count, 0), build(count, 1)
+            for width in ranges:
+                plot_range = Range(-width / 2, width / 2, -2, 2)
+                for name, function in cases(plot, other, plot_range, ax).items():
+                    if only and not any(part in name for part in only): continue
+                    # operations that do not depend on the range are measured once per plot
+                    if width != ranges[0] and name in ('Plot.__add__', 'Plot.__mul__', 'Plot._split', 'Plot.integrate', 'Plot.shift'): continue
+                    result = {'benchmark': name, 'plot': kind, 'segments': count, 'range': [plot_range.x0, plot_range.x1],
+                              **measure(function, min_time)}
+                    results.append(result)
+                    print(f"{name:28} {kind:9} {count:>7} segments  range {width:>6}: {result['best'] * 1e3:10.3f} ms")
+    return results
+
+
+def crosscheck(t_values: list[float] = CROSSCHECK_T) -> list[dict[str, Any]]:
+    # max |U_fd - U_analytic| over the plotted range on a reference problem, for every constraint pair and t
+    x = np.linspace(-3, 3, 241)
+    results = []
+    for left, right in CROSSCHECK_CONSTRAINTS:
+        spec = {'phi': 'exp(-4*x**2)', 'psi': 'max(1 - x**2, 0)', 'left': left, 'right': right}
+        analytic = Problem.fromspec(spec).solve(x, t_values).u
+        scheme = Problem.fromspec({**spec, 'solver': 'finite differences'}).solve(x, t_values).u
+        for t, error in zip(t_values, np.abs(scheme - analytic).max(axis=1)):
+            results.append({'left': left, 'right': right, 't': t, 'error': float(error)})
+            print(f"crosscheck {str(left):14} {str(right):14} t = {t:5.1f}: max |U_fd - U_analytic| = {error:.2e}")
+    for left, right in CROSSCHECK_SOURCE_CONSTRAINTS:
+        x = np.linspace(left[1], right[1], 121)
+        exact = source_series(x, np.asarray(t_values), right[1] - left[1], right[0] == 'even')
+        for solver in ('analytic', 'finite differences'):
+            spec = {'phi': '0', 'psi': '0', 'f': '1', 'left': left, 'right': right, 'solver': solver}
+            u = Problem.fromspec(spec).solve(x, t_values).u
+            for t, error in zip(t_values, np.abs(u - exact).max(axis=1)):
+                results.append({'left': left, 'right': right, 'f': '1', 'solver': solver, 't': t, 'error': float(error)})
+                print(f"crosscheck {str(left):14} {str(right):14} t = {t:5.1f}: f = 1, {solver:18} max |U - U_series| = {error:.2e}")
+    return results
+
+
+def checks() -> list[dict[str, Any]]:
+    # mixed plot arithmetic against the pointwise result, lazy plots refusing it, and formula arity
+    x = np.linspace(*DOMAIN, 241)
+    linear, other, legacy = linear_plot(50, 0), linear_plot(30, 1), legacy_plot(20, 2)
+    jump = LinearPlot([DOMAIN[0], 0, 0, DOMAIN[1]], [0, 1, -1, 0])
+
+    def sample(plot: Plot) -> np.ndarray:
+        return np.array([plot(value) for value in x])
+
+    arithmetic = {
+        'LinearPlot * LinearPlot': (lambda: linear * other, sample(linear) * sample(other)),
+        'LinearPlot with a jump * LinearPlot': (lambda: jump * other, sample(jump) * sample(other)),
+        'PolynomialPlot * LinearPlot': (lambda: linear.integrate() * other, sample(linear.integrate()) * sample(other)),
+        'Plot + LinearPlot': (lambda: legacy + linear, sample(legacy) + sample(linear)),
+        'Plot * LinearPlot': (lambda: legacy * linear, sample(legacy) * sample(linear)),
+        'LinearPlot - Plot': (lambda: linear - legacy, sample(linear) - sample(legacy)),
+        '2 - Plot': (lambda: 2 - legacy, 2 - sample(legacy)),
+    }
+    results = []
+    for name, (build, expected) in arithmetic.items():
+        try:
+            error = float(np.abs(sample(build()) - expected).max())
+        except Exception as exception:
+            error, name = np.inf, f'{name} ({type(exception).__name__}: {exception})'
+        results.append({'check': name, 'passed': error <= CHECK_TOLERANCE, 'error': error})
+    function = FunctionPlot(np.sin, -1, 1)
+    for name, build in {'FunctionPlot + 1': lambda: function + 1, 'LinearPlot * FunctionPlot': lambda: linear * function, 
+                        'ReflectedPlot - LinearPlot': lambda: ReflectedPlot(linear, ('odd', 0)) - linear}.items():
+        results.append({'check': f'{name} raises TypeError', 'passed': _raises(build, TypeError)})
+    for text in CHECK_BAD_FORMULAS:
+        results.append({'check': f'{text} is rejected', 'passed': _raises(lambda: compile_formula(text), FormulaError)})
+    for text in CHECK_FORMULAS:
+        values = x.copy()
+        passed = not _raises(lambda: compile_formula(text)(values), Exception) and bool((values == x).all())
+        results.append({'check': f'{text} leaves x alone', 'passed': passed})
+    for result in results:
+        print(f"check {result['check']:60} {'ok' if result['passed'] else 'FAILED'}")
+    return results
+
+
+def _raises(build: Callable[[], Any], error: type[Exception]) -> bool:
+    # any other exception is a failure of the check as well
+    try:
+        build()
+    except error:
+        return True
+    except Exception:
+        return False
+    return False
+
+
+def source_series(x: np.ndarray, t: np.ndarray, length: float, neumann: bool) -> np.ndarray:
+    # 1 = Σ b sin(kx) over the modes of the interval, and each mode of the response grows as b/k² (1 - cos kt)
+    k = (np.arange(1, CROSSCHECK_MODES + 1) - (0.5 if neumann else 0.0)) * np.pi / length
+    b = 2 * (1 - np.cos(k * length)) / (length * k)
+    return (b / k ** 2 * (1 - np.cos(np.outer(t, k)))) @ np.sin(np.outer(k, x))
+
+
+def metadata() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'time': datetime.now(timezone.utc).isoformat(), 'commit': commit, 'python': sys.version.split()[0],
+            'numpy': np.__version__, 'machine': platform.machine(), 'platform': platform.platform()}
+
+
+def _key(result: dict[str, Any]) -> tuple:
+    return result['benchmark'], result['plot'], result['segments'], tuple(result['range'])
+
+
+def compare(results: list[dict[str, Any]], baseline: list[dict[str, Any]], threshold: float = THRESHOLD) -> list[dict[str, Any]]:
+    # best times are compared, they are the least sensitive to noise on a busy machine
+    previous = {_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None: continue
+        ratio = result['best'] / old['best']
+        if ratio > threshold:
+            regressions.append({**result, 'baseline': old['best'], 'ratio': ratio})
+            print(f"regression: {result['benchmark']} {result['plot']} {result['segments']} segments "
+                  f"range {result['range']}: {old['best'] * 1e3:.3f} -> {result['best'] * 1e3:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> int:
+    parser = ArgumentParser(description='Benchmarks of the plot data structures and their rendering')
+    parser.add_argument('--segments', type=int, nargs='+', default=SEGMENTS)
+    parser.add_argument('--ranges', type=float, nargs='+', default=RANGES, help='widths of the plotted ranges, centred at 0')
+    parser.add_argument('--legacy-segments', type=int, default=LEGACY_SEGMENTS, help='largest segment-list Plot to build')
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help='seconds spent on each measurement')
+    parser.add_argument('--only', nargs='+', help='run the benchmarks whose names contain one of these')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', metavar='BASELINE', help='an earlier output to check for regressions')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='slowdown ratio counted as a regression')
+    parser.add_argument('--crosscheck', action='store_true', 
+                        help='only compare the finite-difference solver with the analytic one up to large t and run the checks')
+    arguments = parser.parse_args()
+
+    if arguments.crosscheck:
+        comparisons, behaviour = crosscheck(), checks()
+        with open(arguments.output, 'w', encoding='utf-8') as file:
+            json.dump({'meta': metadata(), 'crosscheck': comparisons, 'checks': behaviour}, file, indent=1)
+        return 1 if any(check['error'] > CROSSCHECK_TOLERANCE for check in comparisons) or \
+            not all(check['passed'] for check in behaviour) else 0
+    results = run(arguments.segments, arguments.ranges, arguments.legacy_segments, arguments.min_time, arguments.only)
+    with open(arguments.output, 'w', encoding='utf-8') as file:
+        json.dump({'meta': metadata(), 'results': results}, file, indent=1)
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as file:
+            return 1 if compare(results, json.load(file)['results'], arguments.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
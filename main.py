@@ -1,15 +1,39 @@
-from src.window import Window
+from argparse import ArgumentParser
 from sys import argv, exit
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QIcon
 
 if __name__ == "__main__":
-    app = QApplication([argv]) 
-    # with open('src\styles\style.qss', 'r', encoding='utf-8') as file:                     
+    parser = ArgumentParser(description='Wave equation solver')
+    parser.add_argument('--batch', metavar='SPECS', help='solve the problems in a JSON / JSON lines file without the window')
+    parser.add_argument('--export', metavar='SPECS', help='render the problems in a JSON / JSON lines file as animations without the window')
+    parser.add_argument('--format', choices=['gif', 'mp4', 'png'], default='gif', help='animation format of --export, png is a directory of frames')
+    parser.add_argument('--output', default='results', help='directory for the results of --batch and --export')
+    parser.add_argument('--workers', type=int, default=None, help='processes for --batch and --export')
+    arguments, _ = parser.parse_known_args()
+
+    if arguments.batch:
+        from src.batch import run_batch
+        run_batch(arguments.batch, arguments.output, arguments.workers)
+        exit(0)
+
+    if arguments.export:
+        from src.export import export_specs
+        extension = '' if arguments.format == 'png' else f'.{arguments.format}'
+        for name, output in export_specs(arguments.export, arguments.output, extension, arguments.workers).items():
+            # an mp4 without ffmpeg comes back as a directory of frames
+            print(f'{name} -> {output}' if output.endswith(extension) else f'{name}: ffmpeg not found, frames written to {output}')
+        exit(0)
+
+    from src.profiling import install_profiler
+    install_profiler()
+    from src.window import Window
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QIcon
+    app = QApplication([argv])
+    # with open('src\styles\style.qss', 'r', encoding='utf-8') as file:
         # app.setStyleSheet(file.read())
     main = Window()
     main.setWindowTitle('Wave equation solver')
     app.setWindowIcon(QIcon(r'src\styles\icon.png'))
-    main.show()        
+    main.show()
     main.showMaximized()
-    exit(app.exec_())
\ No newline at end of file
+    exit(app.exec_())
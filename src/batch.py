@@ -0,0 +1,71 @@
+from __future__ import annotations
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Optional
+import numpy as np
+from src.executor import DEFAULT_WORKERS
+from src.problem import Problem, t_grid
+from src.widgets import T_VALUES
+
+
+SAMPLES = 1001
+
+
+def load_specs(path: str) -> list[dict[str, Any]]:
+    # a JSON list of problem specs, {"problems": [...]}, or one spec per line (JSON lines)
+    with open(path, encoding='utf-8') as file:
+        text = file.read()
+    try:
+        specs = json.loads(text)
+    except json.JSONDecodeError:
+        specs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(specs, dict):
+        specs = specs.get('problems', [specs])
+    for index, spec in enumerate(specs):
+        spec.setdefault('name', f'problem_{index:04d}')
+    return specs
+
+
+def _filename(name: str, extension: str = '.npz') -> str:
+    return re.sub(r'[^\w.-]+', '_', str(name)) + extension
+
+
+def solve_spec(spec: dict[str, Any], directory: str) -> tuple[str, str, int, float]:
+    # runs in a worker process; the spec travels instead of the problem, since compiled formulas do not pickle
+    start = time.perf_counter()
+    problem = Problem.fromspec(spec)
+    x = np.linspace(problem.plot_range.x0, problem.plot_range.x1, int(spec.get('samples', SAMPLES)))
+    field = problem.solve(x, t_grid(spec, T_VALUES))
+    arrays = {'x': field.x, 't': field.t, 'u': field.u}
+    if field.analytic:
+        arrays.update(phi_term=field.phi_term, psi_term=field.psi_term)
+    if field.f_term is not None:
+        arrays.update(f_term=field.f_term)
+    path = os.path.join(directory, _filename(spec['name']))
+    np.savez_compressed(path, **arrays)
+    return spec['name'], path, field.u.size, time.perf_counter() - start
+
+
+def run_batch(spec_path: str, directory: str, workers: Optional[int] = None) -> list[tuple[str, str, int, float]]:
+    specs = load_specs(spec_path)
+    os.makedirs(directory, exist_ok=True)
+    start, results, failures = time.perf_counter(), [], 0
+    with ProcessPoolExecutor(max_workers=workers or DEFAULT_WORKERS) as pool:
+        futures = {pool.submit(solve_spec, spec, directory): spec['name'] for spec in specs}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                name, path, values, seconds = future.result()
+            except Exception as error:
+                failures += 1
+                print(f'[{done}/{len(specs)}] {futures[future]}: failed ({type(error).__name__}: {error})')
+                continue
+            results.append((name, path, values, seconds))
+            print(f'[{done}/{len(specs)}] {name}: {values} values in {seconds:.3f}s -> {path}')
+    elapsed = time.perf_counter() - start
+    values = sum(result[2] for result in results)
+    print(f'{len(results)} solved, {failures} failed in {elapsed:.2f}s: '
+          f'{len(results) / elapsed:.1f} problems/s, {values / elapsed:.3g} values/s')
+    return results
@@ -0,0 +1,65 @@
+from __future__ import annotations
+from collections import OrderedDict
+from hashlib import sha1
+from typing import Callable, Hashable, Optional
+from src.datastructures import Plot, LinearPlot, PolynomialPlot, ReflectedPlot, FunctionPlot
+from src.solver import Solution
+
+
+def fingerprint(plot: Optional[Plot]) -> str:
+    if plot is None:
+        return 'none'
+    if isinstance(plot, LinearPlot):
+        return sha1(plot.x.tobytes() + plot.y.tobytes()).hexdigest()
+    if isinstance(plot, PolynomialPlot):
+        return sha1(plot.x.tobytes() + plot.coefficients.tobytes()).hexdigest()
+    if isinstance(plot, ReflectedPlot):
+        return sha1(f'{fingerprint(plot.base)}{plot.left}{plot.right}'.encode()).hexdigest()
+    if isinstance(plot, FunctionPlot) and plot.source:
+        return sha1(f'{plot.source}{plot.x0}{plot.x1}{plot.extent}'.encode()).hexdigest()
+    return f'{type(plot).__name__}:{id(plot)}'
+
+
+
+
+class FieldCache:
+    # Bounded LRU of precomputed space-time fields, limited both by entry count and by the total array size
+    def __init__(self, maxsize: int = 8, max_bytes: int = 256 * 2 ** 20) -> None:
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._fields: OrderedDict[Hashable, Solution] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Solution]:
+        field = self._fields.get(key)
+        if field is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._fields.move_to_end(key)
+        return field
+
+    def put(self, key: Hashable, field: Solution) -> None:
+        self._fields[key] = field
+        self._fields.move_to_end(key)
+        while len(self._fields) > 1 and (len(self._fields) > self.maxsize or self.nbytes > self.max_bytes):
+            self._fields.popitem(last=False)
+
+    def field(self, key: Hashable, compute: Callable[[], Solution]) -> Solution:
+        field = self.get(key)
+        if field is not None:
+            return field
+        field = compute()
+        self.put(key, field)
+        return field
+
+    def clear(self) -> None:
+        self._fields.clear()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(field.nbytes for field in self._fields.values())
+
+    def __len__(self) -> int:
+        return len(self._fields)
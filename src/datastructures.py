@@ -1,12 +1,63 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Callable
+from typing import Callable, Hashable, TYPE_CHECKING
+from functools import partial
+from bisect import bisect_left
+from math import comb
+import numpy as np
+from src.quadrature import PANELS, kronrod
+if TYPE_CHECKING:
+    from src.expressions import Expression
+
+
+def _linear(x_current, x_next, y_current, y_next, x) -> float:
+    return ((y_next - y_current) / abs(x_next - x_current)) * (x - x_current) + y_current
 
 
 def create_functions(x_current, x_next, y_current, y_next) -> Callable[..., float]:
-    def _(x) -> float:
-        return ((y_next - y_current) / abs(x_next - x_current)) * (x - x_current) + y_current
-    return _
+    # a partial instead of a closure, so that plots built from it can be sent to worker processes
+    return partial(_linear, x_current, x_next, y_current, y_next)
+
+def _apply(function: Callable, x: np.ndarray) -> np.ndarray:
+    try:
+        return np.broadcast_to(np.asarray(function(x), dtype=float), x.shape)
+    except (TypeError, ValueError):
+        return np.array([function(value) for value in x], dtype=float)
+
+def _apply_flat(function: Callable, x: np.ndarray) -> np.ndarray:
+    return _apply(function, x.ravel()).reshape(x.shape)
+
+def _panel_key(function: Callable) -> Hashable | None:
+    # what a segment function is built from, so equal pieces of different plots share their panels: the arguments
+    # of a partial (create_functions, shifts) and module-level functions. A lambda or a closure has nothing
+    # stable to go by (its identity dies with the plot) and gets None, which is integrated without the cache
+    if isinstance(function, partial):
+        arguments = tuple(_panel_key(argument) if callable(argument) else argument for argument in function.args)
+        if function.keywords or None in arguments or _panel_key(function.func) is None: return None
+        key = (function.func, arguments)
+    elif '<locals>' in getattr(function, '__qualname__', '<locals>') or getattr(function, '__name__', '') == '<lambda>':
+        return None
+    else:
+        key = function
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _antiderivative(pieces: list[tuple[np.ndarray, np.ndarray, np.ndarray]]) -> PolynomialPlot:
+    # panels (edges, integrals, end slopes) of consecutive pieces, joined into one piecewise cubic Hermite:
+    # exact integrals at every edge and the integrand itself as the slope there
+    x = np.concatenate([edges[:-1] for edges, _, _ in pieces] + [pieces[-1][0][-1:]])
+    integrals = np.concatenate([values for _, values, _ in pieces])
+    slopes = np.concatenate([ends for _, _, ends in pieces])
+    width = np.diff(x)
+    secant = integrals / width
+    coefficients = np.stack((np.concatenate(([0], np.cumsum(integrals)[:-1])), slopes[:, 0], 
+                             (3 * secant - 2 * slopes[:, 0] - slopes[:, 1]) / width, 
+                             (slopes[:, 0] + slopes[:, 1] - 2 * secant) / width ** 2), axis=1)
+    return PolynomialPlot(x, coefficients)
 
 
 
@@ -83,15 +134,27 @@ class Segment:
 
 
 class Plot:
+    vectorized = False
+    segmented = True
+
     def __init__(self, segments: list[Segment]) -> None:
+        # a plot's segments are not changed after it is built, every operation returns a new plot
         self.segments = segments
+        self._starts = [segment.x0 for segment in segments]
 
     @classmethod
-    def fromlists(cls, x: list[float], y: list[float]) -> Plot:
-        return Plot([Segment(x[i], x[i + 1], create_functions(x[i], x[i + 1], y[i], y[i + 1])) for i in range(len(x) - 1)])
+    def fromlists(cls, x: list[float], y: list[float]) -> LinearPlot:
+        return LinearPlot(x, y)
+
+    def _check(self, other: float | Plot) -> None:
+        # the operators below work segment by segment; lazy plots (formulas, reflections) have no segments
+        for plot in (self, other):
+            if isinstance(plot, Plot) and not plot.segmented:
+                raise TypeError(f'{type(plot).__name__} has no segments to combine, use plot.lazy() for arithmetic on it')
 
     def __add__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot:
+        self._check(other)
+        if isinstance(other, Plot):
             if not self.segments: return other
             if not other.segments: return self
             result = []
@@ -106,11 +169,13 @@ class Plot:
             return Plot(result)
         return Plot([segment + other for segment in self.segments])
     def __sub__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot: 
+        self._check(other)
+        if isinstance(other, Plot): 
             return self + other * (-1)
         return Plot([segment - other for segment in self.segments])
     def __mul__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot: 
+        self._check(other)
+        if isinstance(other, Plot): 
             result = []
             all_segments = self._split(other)
             for i in  range(len(all_segments) - 1):
@@ -123,7 +188,8 @@ class Plot:
             return Plot(result)
         return Plot([segment * other for segment in self.segments])
     def __div__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot: 
+        self._check(other)
+        if isinstance(other, Plot): 
             result = []
             all_segments = self._split(other)
             for i in  range(len(all_segments) - 1):
@@ -136,72 +202,66 @@ class Plot:
             return Plot(result)
         return Plot([segment / other for segment in self.segments])
     def __radd__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot: \
-            return other + self
+        self._check(other)
+        if isinstance(other, Plot): 
+            return Plot.__add__(other, self)
         return Plot([segment + other for segment in self.segments])
     def __rsub__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot: 
-            return other - self
-        return Plot([segment - other for segment in self.segments])
+        self._check(other)
+        if isinstance(other, Plot): 
+            return Plot.__sub__(other, self)
+        return Plot([other - segment for segment in self.segments])
     def __rmul__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot: 
-            return other * self
+        self._check(other)
+        if isinstance(other, Plot): 
+            return Plot.__mul__(other, self)
         return Plot([segment * other for segment in self.segments])
     def __rdiv__(self, other: float | Plot) -> Plot:
-        if type(other) == Plot: 
-            return other / self
+        self._check(other)
+        if isinstance(other, Plot): 
+            return Plot.__div__(other, self)
         return Plot([segment / other for segment in self.segments])
     
     def _split(self, other: Plot) -> list[float]:
-        all_segments = []
-        for segment in self.segments:
-            if segment.x0 not in all_segments:
-                all_segments.append(segment.x0)
-            if segment.x0 not in all_segments:
-                all_segments.append(segment.x1)
-        for segment in other.segments:
-            if segment.x0 not in all_segments:
-                all_segments.append(segment.x0)
-            if segment.x1 not in all_segments:
-                all_segments.append(segment.x1)
-        return sorted(all_segments)
+        return np.unique([bound for segment in self.segments + other.segments for bound in (segment.x0, segment.x1)]).tolist()
     
-    def _split_zero(self) -> float:
-        if self.end <= 0:
-            return len(self.segments)
-        if self.start >= 0:
-            return 0
-        for zero_index, segment in enumerate(self.segments):
-            if segment.x0 == 0:
-                return zero_index
-            if segment.x0 < 0 < segment.x1:
-                deleted_segment = self.segments.pop(zero_index)
-                self.segments.insert(zero_index, Segment(0, deleted_segment.x1, lambda x: deleted_segment(x)))
-                self.segments.insert(zero_index, Segment(deleted_segment.x0, 0, lambda x: deleted_segment(x)))
-                return zero_index + 1
-
     def integrate(self) -> Plot:
         if self.segments == []: return self
-        result = []
-        previous_sum = 0
-        zero_index = self._split_zero()
-        for i in range(zero_index, len(self.segments)):
-            integrated, previous_sum = self.segments[i].integrate(previous_sum)
-            result.append(integrated)
-        previous_sum = 0
-        for i in range(zero_index - 1, -1, -1):
-            integrated, previous_sum = self.segments[i].integrate(previous_sum)
-            result.insert(0, integrated)
-        return Plot(result)
+        # each segment is integrated adaptively on its own (and cached), one cumulative sum joins them
+        result = _antiderivative([PANELS.get(partial(_apply_flat, segment), segment.x0, segment.x1, key=_panel_key(segment.function)) 
+                                  for segment in self.segments if segment.x1 > segment.x0])
+        return result - result(min(max(0, self.start), self.end))
     
-    def __call__(self, x: float) -> float:
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        if not self.segments: return np.zeros(xs.shape)
+        starts = np.asarray(self._starts)
+        clamped = np.clip(xs, self.start, self.end)
+        # first segment with x0 <= x <= x1, same as the old linear scan
+        index = np.clip(np.searchsorted(starts, clamped, side='left') - 1, 0, len(starts) - 1).ravel()
+        order = np.argsort(index, kind='stable')
+        bounds = np.searchsorted(index[order], np.arange(len(starts) + 1))
+        flat, result = clamped.ravel(), np.empty(xs.size)
+        for i in range(len(starts)):
+            if bounds[i] == bounds[i + 1]: continue
+            selected = order[bounds[i]:bounds[i + 1]]
+            result[selected] = _apply(self.segments[i], flat[selected])
+        return result.reshape(xs.shape)
+
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+        if isinstance(x, np.ndarray): return self.evaluate(x)
         if not self.segments: return 0
-        if x < self.start: return self(self.start) 
-        if x > self.end: return self(self.end)
-        i = 0
-        while not self.segments[i].x0 <= x <= self.segments[i].x1: 
-            i += 1
-        return self.segments[i](x)
+        # the same segment as evaluate picks, without building arrays for one point
+        x = min(max(x, self.start), self.end)
+        return float(self.segments[max(bisect_left(self._starts, x) - 1, 0)](x))
+
+    def lazy(self) -> Expression:
+        from src.expressions import lazy
+        return lazy(self)
+
+    def simplify(self, tolerance: float = 0.0) -> Plot:
+        # segments of arbitrary functions cannot be merged
+        return self
 
     def shift(self, shift_amount: float) -> Plot:
         new_segments = []
@@ -209,12 +269,13 @@ class Plot:
             new_segment = Segment(
                 segment.x0 + shift_amount,
                 segment.x1 + shift_amount,
-                lambda x, seg=segment, shift=shift_amount: seg(x - shift)
+                partial(_shifted_call, segment.function, shift_amount)
             )
             new_segments.append(new_segment)
         return Plot(new_segments)
     def __str__(self) -> str:
-        return f"Plot(length = {len(self.segments)},\n{'\n'.join(str(segment) for segment in self.segments)}\n)"
+        segments = '\n'.join(str(segment) for segment in self.segments)
+        return f"Plot(length = {len(self.segments)},\n{segments}\n)"
     def __len__(self) -> Plot:
         return self.end - self.start
     
@@ -226,8 +287,617 @@ class Plot:
     def end(self) -> float:
         return self.segments[-1].x1
 
-    def extend(self, amount: float) -> Plot:
-        num = amount
-        return Plot([Segment(self.start - num, self.start, lambda _: self(self.start))] + \
-            self.segments + [Segment(self.end, self.end + num, lambda _: self(self.end))])
-    
\ No newline at end of file
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None:
+        return None
+
+
+
+
+class LinearPlot(Plot):
+    __array_ufunc__ = None
+    vectorized = True
+
+    def __init__(self, x: list[float] | np.ndarray, y: list[float] | np.ndarray) -> None:
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        assert self.x.shape == self.y.shape
+
+    @property
+    def segments(self) -> list[Segment]:
+        return [Segment(self.x[i], self.x[i + 1], create_functions(self.x[i], self.x[i + 1], self.y[i], self.y[i + 1])) 
+                for i in range(len(self.x) - 1) if self.x[i] != self.x[i + 1]]
+
+    def _limits(self, knots: np.ndarray, side: str) -> np.ndarray:
+        if len(self.x) == 0: return np.zeros(len(knots))
+        if len(self.x) == 1: return np.full(len(knots), self.y[0])
+        # side='left' takes the value of the segment ending at a knot, side='right' of the one starting there
+        j = np.clip(np.searchsorted(self.x, knots, side=side) - 1, 0, len(self.x) - 2)
+        width = self.x[j + 1] - self.x[j]
+        fraction = np.where(width > 0, (knots - self.x[j]) / np.where(width > 0, width, 1), 
+                            np.where(knots > self.x[j], 1.0, float(side == 'right')))
+        fraction = np.clip(fraction, 0, 1)
+        return self.y[j] + (self.y[j + 1] - self.y[j]) * fraction
+
+    def _combine(self, other: LinearPlot, operation: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> LinearPlot:
+        knots = np.union1d(self.x, other.x)
+        left = operation(self._limits(knots, 'left'), other._limits(knots, 'left'))
+        right = operation(self._limits(knots, 'right'), other._limits(knots, 'right'))
+        jump = (left != right).astype(int)
+        first = np.cumsum(1 + jump) - 1 - jump
+        x, y = np.repeat(knots, 1 + jump), np.empty(len(knots) + jump.sum())
+        y[first] = left
+        y[first + jump] = right
+        return LinearPlot(x, y)
+
+    def __add__(self, other: float | Plot) -> Plot:
+        if isinstance(other, PolynomialPlot): return self.to_polynomial() + other
+        if isinstance(other, LinearPlot): return self._combine(other, np.add)
+        if isinstance(other, Plot): return Plot.__add__(self, other)
+        return LinearPlot(self.x, self.y + other)
+    def __sub__(self, other: float | Plot) -> Plot:
+        if isinstance(other, PolynomialPlot): return self.to_polynomial() - other
+        if isinstance(other, LinearPlot): return self._combine(other, np.subtract)
+        if isinstance(other, Plot): return Plot.__sub__(self, other)
+        return LinearPlot(self.x, self.y - other)
+    def __mul__(self, other: float | Plot) -> Plot:
+        if isinstance(other, (LinearPlot, PolynomialPlot)): return self.to_polynomial() * other
+        if isinstance(other, Plot): return Plot.__mul__(self, other)
+        return LinearPlot(self.x, self.y * other)
+    def __truediv__(self, other: float) -> LinearPlot:
+        return LinearPlot(self.x, self.y / other)
+    def __radd__(self, other: float | Plot) -> Plot:
+        if isinstance(other, Plot): return Plot.__add__(other, self)
+        return LinearPlot(self.x, other + self.y)
+    def __rsub__(self, other: float | Plot) -> Plot:
+        if isinstance(other, Plot): return Plot.__sub__(other, self)
+        return LinearPlot(self.x, other - self.y)
+    def __rmul__(self, other: float | Plot) -> Plot:
+        if isinstance(other, Plot): return Plot.__mul__(other, self)
+        return LinearPlot(self.x, other * self.y)
+    def __neg__(self) -> LinearPlot:
+        return LinearPlot(self.x, -self.y)
+
+    def to_polynomial(self) -> PolynomialPlot:
+        width = np.diff(self.x)
+        slope = np.where(width > 0, np.diff(self.y) / np.where(width > 0, width, 1), 0)
+        return PolynomialPlot(self.x, np.column_stack((self.y[:-1], slope)))
+
+    def integrate(self) -> Plot:
+        if len(self.x) < 2: return LinearPlot(self.x, np.zeros(len(self.x)))
+        return self.to_polynomial().integrate()
+
+    def reintegrate(self, previous: LinearPlot, integral: PolynomialPlot) -> Plot:
+        # the integral of an edited copy of previous, from the integral of previous: only the segments between the first
+        # and the last changed vertex are integrated, the cumulative values after them move by one constant
+        size = min(len(self.x), len(previous.x))
+        if size < 2 or len(integral.x) != len(previous.x) or integral.degree != 2: return self.integrate()
+        same = (self.x[:size] == previous.x[:size]) & (self.y[:size] == previous.y[:size])
+        first = int(np.argmin(same)) if not same.all() else size
+        if first == size and len(self.x) == len(previous.x): return integral
+        if first == 0: return self.integrate()
+        same = (self.x[::-1][:size] == previous.x[::-1][:size]) & (self.y[::-1][:size] == previous.y[::-1][:size])
+        tail = min(int(np.argmin(same)) if not same.all() else size, size - first)
+        start, stop, old_stop = first - 1, len(self.x) - max(tail, 1), len(previous.x) - max(tail, 1)
+
+        width = np.diff(self.x[start:stop + 1])
+        slope = np.where(width > 0, np.diff(self.y[start:stop + 1]) / np.where(width > 0, width, 1), 0)
+        totals = self.y[start:stop] * width + slope / 2 * width ** 2
+        value = integral(float(previous.x[start]))
+        coefficients = np.concatenate((integral.coefficients[:start], 
+                np.column_stack((value + np.cumsum(np.concatenate(([0], totals)))[:-1], self.y[start:stop], slope / 2)), 
+                integral.coefficients[old_stop:]))
+        coefficients[stop:, 0] += value + totals.sum() - integral(float(previous.x[old_stop]))
+        result = PolynomialPlot(self.x, coefficients)
+        return result - result(min(max(0, self.start), self.end))
+
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        return self._limits(xs.ravel(), 'left').reshape(xs.shape)
+
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+        if isinstance(x, np.ndarray): return self.evaluate(x)
+        if len(self.x) == 0: return 0
+        if x <= self.x[0]: return float(self.y[0])
+        if x >= self.x[-1]: return float(self.y[-1])
+        i = bisect_left(self.x, x)
+        fraction = (x - self.x[i - 1]) / (self.x[i] - self.x[i - 1])
+        return float(self.y[i - 1] + (self.y[i] - self.y[i - 1]) * fraction)
+
+    def simplify(self, tolerance: float = 0.0) -> LinearPlot:
+        # drops the vertices lying on the line through their neighbours (up to rounding), then, for a positive tolerance,
+        # the ones Douglas-Peucker finds within tolerance of the chord, measured along y. Ends and jumps are kept
+        if len(self.x) < 3: return self
+        width, left = self.x[2:] - self.x[:-2], self.x[1:-1] - self.x[:-2]
+        chord = self.y[:-2] + (self.y[2:] - self.y[:-2]) * left / np.where(width > 0, width, 1)
+        collinear = (left > 0) & (self.x[2:] > self.x[1:-1]) & \
+                    (np.abs(self.y[1:-1] - chord) <= COLLINEAR_TOLERANCE * np.maximum(1, np.abs(self.y[1:-1])))
+        keep = np.concatenate(([True], ~collinear, [True]))
+        if tolerance > 0:
+            keep[keep] = _decimate(self.x[keep], self.y[keep], tolerance)
+        if keep.all(): return self
+        return LinearPlot(self.x[keep], self.y[keep])
+
+    def shift(self, shift_amount: float) -> LinearPlot:
+        return LinearPlot(self.x + shift_amount, self.y)
+    def __str__(self) -> str:
+        return f"LinearPlot(length = {max(len(self.x) - 1, 0)}, x = {self.x}, y = {self.y})"
+
+    @property
+    def start(self) -> float:
+        if len(self.x) == 0: return 0
+        return float(self.x[0])
+    @property
+    def end(self) -> float:
+        if len(self.x) == 0: return 0
+        return float(self.x[-1])
+
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray:
+        return self.x[(self.x > x0) & (self.x < x1)]
+
+
+
+
+class PolynomialPlot(Plot):
+    __array_ufunc__ = None
+    vectorized = True
+
+    # coefficients[i] holds the ascending powers of (x - x[i]) on the segment [x[i], x[i + 1]]
+    def __init__(self, x: list[float] | np.ndarray, coefficients: list[list[float]] | np.ndarray) -> None:
+        self.x = np.asarray(x, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=float).reshape(max(len(self.x) - 1, 0), -1)
+
+    @property
+    def degree(self) -> int:
+        return self.coefficients.shape[1] - 1
+
+    @property
+    def segments(self) -> list[Segment]:
+        return [Segment(self.x[i], self.x[i + 1], lambda x, i=i: self._horner(np.full(np.shape(x), i), x - self.x[i]))
+                for i in range(len(self.x) - 1) if self.x[i] != self.x[i + 1]]
+
+    def _horner(self, index: np.ndarray, u: np.ndarray) -> np.ndarray:
+        result = self.coefficients[index, -1]
+        for power in range(self.degree - 1, -1, -1):
+            result = result * u + self.coefficients[index, power]
+        return result
+
+    def _elevate(self, degree: int) -> np.ndarray:
+        return np.pad(self.coefficients, ((0, 0), (0, degree - self.degree)))
+
+    def _recenter(self, knots: np.ndarray, degree: int) -> np.ndarray:
+        # Taylor-shift every piece of the merged knot grid to its own left end, holding the endpoint values outside [start, end]
+        middle = (knots[:-1] + knots[1:]) / 2
+        index = np.clip(np.searchsorted(self.x, middle, side='left') - 1, 0, len(self.x) - 2)
+        source, shift = self._elevate(degree)[index], knots[:-1] - self.x[index]
+        result = np.zeros_like(source)
+        for power in range(degree + 1):
+            for higher in range(power, degree + 1):
+                result[:, power] += source[:, higher] * comb(higher, power) * shift ** (higher - power)
+        outside = (middle < self.start) | (middle > self.end)
+        result[outside] = 0
+        result[outside, 0] = self.evaluate(middle[outside])
+        return result
+
+    def _combine(self, other: PolynomialPlot, operation: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> PolynomialPlot:
+        if len(self.x) < 2: return operation(0, other)
+        if len(other.x) < 2: return operation(self, 0)
+        knots, degree = np.union1d(self.x, other.x), max(self.degree, other.degree)
+        return PolynomialPlot(knots, operation(self._recenter(knots, degree), other._recenter(knots, degree)))
+
+    def _product(self, other: PolynomialPlot) -> PolynomialPlot:
+        # both recentred on the merged knots, then the coefficients of every piece convolved
+        if len(self.x) < 2: return other._scaled(0, 0)
+        if len(other.x) < 2: return self._scaled(0, 0)
+        knots = np.union1d(self.x, other.x)
+        left, right = self._recenter(knots, self.degree), other._recenter(knots, other.degree)
+        coefficients = np.zeros((len(knots) - 1, self.degree + other.degree + 1))
+        for i in range(self.degree + 1):
+            coefficients[:, i:i + other.degree + 1] += left[:, i:i + 1] * right
+        return PolynomialPlot(knots, coefficients)
+
+    def _scaled(self, offset: float, factor: float) -> PolynomialPlot:
+        coefficients = self.coefficients * factor
+        coefficients[:, 0] += offset
+        return PolynomialPlot(self.x, coefficients)
+
+    def __add__(self, other: float | Plot) -> Plot:
+        if isinstance(other, LinearPlot): other = other.to_polynomial()
+        if isinstance(other, PolynomialPlot): return self._combine(other, np.add)
+        if isinstance(other, Plot): return Plot.__add__(self, other)
+        return self._scaled(other, 1)
+    def __sub__(self, other: float | Plot) -> Plot:
+        if isinstance(other, LinearPlot): other = other.to_polynomial()
+        if isinstance(other, PolynomialPlot): return self._combine(other, np.subtract)
+        if isinstance(other, Plot): return Plot.__sub__(self, other)
+        return self._scaled(-other, 1)
+    def __mul__(self, other: float | Plot) -> Plot:
+        if isinstance(other, LinearPlot): other = other.to_polynomial()
+        if isinstance(other, PolynomialPlot): return self._product(other)
+        if isinstance(other, Plot): return Plot.__mul__(self, other)
+        return self._scaled(0, other)
+    def __truediv__(self, other: float) -> PolynomialPlot:
+        return self._scaled(0, 1 / other)
+    def __radd__(self, other: float | Plot) -> Plot:
+        if isinstance(other, Plot): return Plot.__add__(other, self)
+        return self._scaled(other, 1)
+    def __rsub__(self, other: float | Plot) -> Plot:
+        if isinstance(other, Plot): return Plot.__sub__(other, self)
+        return self._scaled(other, -1)
+    def __rmul__(self, other: float | Plot) -> Plot:
+        if isinstance(other, Plot): return Plot.__mul__(other, self)
+        return self._scaled(0, other)
+    def __neg__(self) -> PolynomialPlot:
+        return self._scaled(0, -1)
+
+    def to_polynomial(self) -> PolynomialPlot:
+        return self
+
+    def integrate(self) -> PolynomialPlot:
+        if len(self.x) < 2: return self
+        powers = np.arange(1, self.degree + 2)
+        coefficients = np.zeros((len(self.x) - 1, self.degree + 2))
+        coefficients[:, 1:] = self.coefficients / powers
+        # one cumulative pass over the segment integrals gives the value at every breakpoint
+        totals = (coefficients[:, 1:] * np.diff(self.x)[:, None] ** powers).sum(axis=1)
+        coefficients[:, 0] = np.concatenate(([0], np.cumsum(totals)[:-1]))
+        result = PolynomialPlot(self.x, coefficients)
+        # same anchor as Segment.integrate: the integral vanishes at the point of the domain closest to zero
+        return result - result(min(max(0, self.start), self.end))
+
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        if len(self.x) < 2: return np.zeros(xs.shape)
+        clamped = np.clip(xs, self.start, self.end)
+        index = np.clip(np.searchsorted(self.x, clamped, side='left') - 1, 0, len(self.x) - 2)
+        return self._horner(index, clamped - self.x[index])
+
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+        if isinstance(x, np.ndarray): return self.evaluate(x)
+        if len(self.x) < 2: return 0
+        return float(self.evaluate(np.array([x]))[0])
+
+    def shift(self, shift_amount: float) -> PolynomialPlot:
+        return PolynomialPlot(self.x + shift_amount, self.coefficients)
+    def __str__(self) -> str:
+        return f"PolynomialPlot(length = {max(len(self.x) - 1, 0)}, degree = {self.degree}, x = {self.x})"
+
+    @property
+    def start(self) -> float:
+        if len(self.x) == 0: return 0
+        return float(self.x[0])
+    @property
+    def end(self) -> float:
+        if len(self.x) == 0: return 0
+        return float(self.x[-1])
+
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None:
+        if self.degree > 1 and self.coefficients[:, 2:].any(): return None
+        return self.x[(self.x > x0) & (self.x < x1)]
+
+
+
+
+APPROXIMATION_TOLERANCE = 1e-3
+COLLINEAR_TOLERANCE = 1e-12
+INITIAL_INTERVALS = 16
+MAX_VERTICES = 100_000
+PROBES = np.array([0.25, 0.5, 0.75])
+
+
+def approximate(function: Callable[[np.ndarray], np.ndarray], x0: float, x1: float, 
+                tolerance: float = APPROXIMATION_TOLERANCE) -> LinearPlot:
+    # Bisects every interval whose chord misses the function by more than the tolerance at its quarter points,
+    # so vertices gather where the curvature is and smooth stretches stay coarse
+    x = np.linspace(x0, x1, INITIAL_INTERVALS + 1)
+    y = np.asarray(function(x), dtype=float)
+    smallest = (x1 - x0) * 1e-9
+    while len(x) < MAX_VERTICES:
+        width = np.diff(x)
+        probes = x[:-1, None] + width[:, None] * PROBES
+        chords = y[:-1, None] + np.diff(y)[:, None] * PROBES
+        with np.errstate(invalid='ignore'):
+            error = np.abs(np.asarray(function(probes), dtype=float) - chords).max(axis=1)
+        coarse = np.flatnonzero(~(error <= tolerance) & (width > smallest))
+        if len(coarse) == 0: break
+        coarse = coarse[:MAX_VERTICES - len(x)]
+        middle = x[coarse] + width[coarse] / 2
+        x = np.insert(x, coarse + 1, middle)
+        y = np.insert(y, coarse + 1, np.asarray(function(middle), dtype=float))
+    return LinearPlot(x, y).simplify()
+
+
+def _decimate(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    # Douglas-Peucker between fixed vertices (the ends and both sides of every jump): the vertex farthest from
+    # the chord is kept while it misses by more than the tolerance. Returns the mask of kept vertices
+    keep = np.zeros(len(x), dtype=bool)
+    keep[[0, -1]] = True
+    jumps = np.flatnonzero(np.diff(x) == 0)
+    keep[jumps] = keep[jumps + 1] = True
+    fixed = np.flatnonzero(keep)
+    stack = list(zip(fixed[:-1], fixed[1:]))
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2: continue
+        chord = y[first] + (y[last] - y[first]) * (x[first + 1:last] - x[first]) / (x[last] - x[first])
+        error = np.abs(y[first + 1:last] - chord)
+        worst = int(np.argmax(error))
+        if error[worst] > tolerance:
+            middle = first + 1 + worst
+            keep[middle] = True
+            stack += [(first, middle), (middle, last)]
+    return keep
+
+
+def _shifted_call(function: Callable[[np.ndarray], np.ndarray], shift_amount: float, x: np.ndarray) -> np.ndarray:
+    return function(x - shift_amount)
+
+
+class FunctionPlot(Plot):
+    __array_ufunc__ = None
+    vectorized = True
+    segmented = False
+
+    # A smooth input kept as its analytic callable on [x0, x1], clamped to the end values outside it like the
+    # other plots. extent only widens what start/end report, so the clamped tails can be covered and integrated.
+    def __init__(self, function: Callable[[np.ndarray], np.ndarray], x0: float, x1: float, source: str = '', 
+                 extent: tuple[float, float] | None = None) -> None:
+        assert x1 > x0
+        self.function = function
+        self.x0 = x0
+        self.x1 = x1
+        self.source = source
+        self.extent = (x0, x1) if extent is None else extent
+
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        return np.broadcast_to(np.asarray(self.function(np.clip(xs, self.x0, self.x1)), dtype=float), xs.shape)
+
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+        if isinstance(x, np.ndarray): return self.evaluate(x)
+        return float(self.evaluate(np.array([x]))[0])
+
+    def linearize(self, tolerance: float = APPROXIMATION_TOLERANCE) -> LinearPlot:
+        return approximate(self.evaluate, self.start, self.end, tolerance)
+
+    def integrate(self) -> PolynomialPlot:
+        pieces = [PANELS.get(self.function, self.x0, self.x1, key=self.source or _panel_key(self.function))]
+        # the clamped tails are constant
+        for x0, x1, value in ((self.start, self.x0, self(self.x0)), (self.x1, self.end, self(self.x1))):
+            if x1 > x0:
+                pieces.append((np.array([x0, x1]), np.array([value * (x1 - x0)]), np.array([[value, value]])))
+        result = _antiderivative(sorted(pieces, key=lambda piece: piece[0][0]))
+        return result - result(min(max(0, self.start), self.end))
+
+    def shift(self, shift_amount: float) -> FunctionPlot:
+        # the source names the shifted function, not the original one
+        return FunctionPlot(partial(_shifted_call, self.function, shift_amount), self.x0 + shift_amount, 
+                            self.x1 + shift_amount, self.source and f'{self.source}>>{shift_amount}', 
+                            (self.start + shift_amount, self.end + shift_amount))
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None:
+        return None
+    def __str__(self) -> str:
+        return f"FunctionPlot({self.source or self.function}, x0 = {self.x0}, x1 = {self.x1})"
+
+    @property
+    def start(self) -> float:
+        return self.extent[0]
+    @property
+    def end(self) -> float:
+        return self.extent[1]
+
+
+
+
+MAX_BREAKPOINTS = 200_000
+
+
+def _covering(plot: Plot, points: list[float]) -> Plot:
+    # holds the end values out to the constraint points, like the constant segments the reflection used to add
+    if isinstance(plot, FunctionPlot) and points:
+        return FunctionPlot(plot.function, plot.x0, plot.x1, plot.source, 
+                            (min(plot.start, *points), max(plot.end, *points)))
+    if not isinstance(plot, LinearPlot) or len(plot.x) == 0 or not points: return plot
+    x, y = plot.x, plot.y
+    if min(points) < plot.start:
+        x, y = np.concatenate(([min(points)], x)), np.concatenate(([y[0]], y))
+    if max(points) > plot.end:
+        x, y = np.concatenate((x, [max(points)])), np.concatenate((y, [y[-1]]))
+    return LinearPlot(x, y)
+
+
+def _sign(constraint_type: str) -> float:
+    assert constraint_type in ('odd', 'even')
+    return -1.0 if constraint_type == 'odd' else 1.0
+
+
+
+
+def fold(xs: np.ndarray, left: tuple[str, float] | None, right: tuple[str, float] | None
+         ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # maps every x onto its image u in [x0_left, x0_right] and the sign the odd/even extension takes there,
+    # together with the period index and whether x lands on a mirrored half-period
+    if right is None or left is None:
+        constraint_type, x0 = left or right
+        mirrored = xs < x0 if right is None else xs > x0
+        return np.where(mirrored, 2 * x0 - xs, xs), np.where(mirrored, _sign(constraint_type), 1.0), np.zeros(xs.shape), mirrored
+    (left_type, x0_left), (right_type, x0_right) = left, right
+    length = x0_right - x0_left
+    cells = np.floor((xs - x0_left) / (2 * length))
+    phase = xs - x0_left - 2 * length * cells
+    mirrored = phase > length
+    u = np.where(mirrored, x0_left + 2 * length - phase, x0_left + phase)
+    # crossing one full period reflects once about each end
+    sign = np.where(cells % 2 == 0, 1.0, _sign(left_type) * _sign(right_type)) * np.where(mirrored, _sign(right_type), 1.0)
+    return u, sign, cells, mirrored
+
+
+class ReflectedPlot(Plot):
+    __array_ufunc__ = None
+    vectorized = True
+    segmented = False
+
+    # Odd/even extension of base past the constraint points. Nothing is copied: evaluation folds every x back
+    # into [x0_left, x0_right] (period 2L, anti-periodic when the two constraint types differ).
+    def __init__(self, base: Plot, left: tuple[str, float] | None = None, right: tuple[str, float] | None = None) -> None:
+        assert left is not None or right is not None
+        if left is not None and right is not None:
+            assert right[1] > left[1]
+        self.left = left
+        self.right = right
+        self.base = _covering(base, [constraint[1] for constraint in (left, right) if constraint is not None])
+
+    def _fold(self, xs: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        return fold(xs, self.left, self.right)
+
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        u, sign, _, _ = self._fold(xs)
+        return sign * self.base.evaluate(u)
+
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+        if isinstance(x, np.ndarray): return self.evaluate(x)
+        return float(self.evaluate(np.array([x]))[0])
+
+    def integrate(self) -> ReflectedIntegral:
+        return ReflectedIntegral(self.base.integrate(), self.left, self.right)
+
+    def _shifted(self, shift_amount: float) -> tuple[Plot, tuple[str, float] | None, tuple[str, float] | None]:
+        return (self.base.shift(shift_amount), 
+                None if self.left is None else (self.left[0], self.left[1] + shift_amount), 
+                None if self.right is None else (self.right[0], self.right[1] + shift_amount))
+
+    def simplify(self, tolerance: float = 0.0) -> ReflectedPlot:
+        base = self.base.simplify(tolerance)
+        return self if base is self.base else ReflectedPlot(base, self.left, self.right)
+
+    def shift(self, shift_amount: float) -> ReflectedPlot:
+        return ReflectedPlot(*self._shifted(shift_amount))
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None:
+        return self._unfold(self.base.breakpoints(-np.inf, np.inf), x0, x1)
+    def _unfold(self, points: np.ndarray | None, x0: float, x1: float) -> np.ndarray | None:
+        # the images in (x0, x1) of points of the base, the constraint points among them
+        if points is None: return None
+        if self.right is None or self.left is None:
+            constraint_x0 = (self.left or self.right)[1]
+            points = np.concatenate((points, 2 * constraint_x0 - points, [constraint_x0]))
+            return points[(points > x0) & (points < x1)]
+        x0_left, x0_right = self.left[1], self.right[1]
+        length = x0_right - x0_left
+        inner = np.concatenate((points[(points > x0_left) & (points < x0_right)], [x0_left, x0_right])) - x0_left
+        cells = np.arange(np.floor((x0 - x0_left) / (2 * length)), np.floor((x1 - x0_left) / (2 * length)) + 1)
+        if len(cells) * len(inner) > MAX_BREAKPOINTS: return None
+        points = (x0_left + 2 * length * cells[:, None] + np.concatenate((inner, 2 * length - inner))[None, :]).ravel()
+        return points[(points > x0) & (points < x1)]
+    def __str__(self) -> str:
+        return f"ReflectedPlot(left = {self.left}, right = {self.right}, base = {self.base})"
+
+    @property
+    def start(self) -> float:
+        return -np.inf
+    @property
+    def end(self) -> float:
+        return np.inf
+
+
+class ReflectedIntegral(ReflectedPlot):
+    # base is the antiderivative G of the reflected function; the integral over each fold is assembled from G,
+    # and the result vanishes at x = 0 like Plot.integrate
+    def __init__(self, base: Plot, left: tuple[str, float] | None = None, right: tuple[str, float] | None = None, 
+                 offset: float | None = None) -> None:
+        super().__init__(base, left, right)
+        self.offset = 0.0
+        self.offset = -float(self.evaluate(np.zeros(1))[0]) if offset is None else offset
+
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        u, sign, cells, mirrored = self._fold(xs)
+        if self.right is None or self.left is None:
+            x0 = (self.left or self.right)[1]
+            return np.where(mirrored, -sign, sign) * (self.base.evaluate(u) - self.base(x0)) + self.offset
+        (left_type, x0_left), (right_type, x0_right) = self.left, self.right
+        span = self.base(x0_right) - self.base(x0_left)
+        partial = np.where(mirrored, span - _sign(right_type) * (self.base.evaluate(u) - self.base(x0_right)), 
+                           self.base.evaluate(u) - self.base(x0_left))
+        ratio = _sign(left_type) * _sign(right_type)
+        whole_cells = cells if ratio > 0 else (1 - (-1.0) ** cells) / 2
+        return span * (1 + _sign(right_type)) * whole_cells + np.where(cells % 2 == 0, 1.0, ratio) * partial + self.offset
+
+    def integrate(self) -> CumulativeIntegral:
+        # piecewise polynomial between the folded knots of the antiderivative, where the quadrature is exact
+        return CumulativeIntegral(self, self.knots)
+
+    def knots(self, x0: float, x1: float) -> np.ndarray | None:
+        return self._unfold(getattr(self.base, 'x', None), x0, x1)
+
+    def shift(self, shift_amount: float) -> ReflectedIntegral:
+        return ReflectedIntegral(*self._shifted(shift_amount), offset=self.offset)
+
+
+
+
+KNOTLESS_PIECES = 4096
+
+
+class CumulativeIntegral(Plot):
+    __array_ufunc__ = None
+    vectorized = True
+    segmented = False
+
+    # The integral from 0 of an integrand defined on the whole line, for which there is no antiderivative in closed
+    # form: Gauss-Kronrod on every piece between the integrand's knots and the points asked for, one cumulative sum
+    # joins them. Shifting moves the arguments instead of the integrand.
+    def __init__(self, integrand: Plot, knots: Callable[[float, float], np.ndarray | None] | None = None, 
+                 shift_amount: float = 0.0) -> None:
+        self.integrand = integrand
+        self._knots = knots or integrand.breakpoints
+        self.shift_amount = shift_amount
+
+    def knots(self, x0: float, x1: float) -> np.ndarray | None:
+        points = self._knots(x0 - self.shift_amount, x1 - self.shift_amount)
+        return None if points is None else points + self.shift_amount
+
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        u = xs.ravel() - self.shift_amount
+        edges = np.union1d(u, [0.0])
+        if len(edges) == 1: return np.zeros(xs.shape)
+        knots = self._knots(edges[0], edges[-1])
+        if knots is None: knots = np.linspace(edges[0], edges[-1], KNOTLESS_PIECES + 1)
+        edges = np.union1d(edges, knots)
+        total = np.concatenate(([0.0], np.cumsum(kronrod(self.integrand.evaluate, edges[:-1], edges[1:])[0])))
+        return (total[np.searchsorted(edges, u)] - total[np.searchsorted(edges, 0.0)]).reshape(xs.shape)
+
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+        if isinstance(x, np.ndarray): return self.evaluate(x)
+        return float(self.evaluate(np.array([x]))[0])
+
+    def integrate(self) -> CumulativeIntegral:
+        return CumulativeIntegral(self, self.knots)
+
+    def shift(self, shift_amount: float) -> CumulativeIntegral:
+        return CumulativeIntegral(self.integrand, self._knots, self.shift_amount + shift_amount)
+    def simplify(self, tolerance: float = 0.0) -> CumulativeIntegral:
+        return self
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None:
+        return None
+    def __str__(self) -> str:
+        return f"CumulativeIntegral({self.integrand}, shift = {self.shift_amount})"
+
+    @property
+    def start(self) -> float:
+        return -np.inf
+    @property
+    def end(self) -> float:
+        return np.inf
+
+
+
+
+def reintegrate(plot: Plot, previous: Plot | None, integral: Plot | None) -> Plot:
+    # plot.integrate(), reusing the integral of the plot it was edited from when both are (folded) LinearPlots
+    if isinstance(plot, ReflectedPlot) and isinstance(previous, ReflectedPlot) and isinstance(integral, ReflectedIntegral) \
+            and (plot.left, plot.right) == (previous.left, previous.right):
+        return ReflectedIntegral(reintegrate(plot.base, previous.base, integral.base), plot.left, plot.right)
+    if type(plot) is LinearPlot and type(previous) is LinearPlot and isinstance(integral, PolynomialPlot):
+        return plot.reintegrate(previous, integral)
+    return plot.integrate()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+import os
+import pickle
+from concurrent.futures import Executor as PoolExecutor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+from src.datastructures import Plot
+
+
+DEFAULT_WORKERS = int(os.environ.get('WAVE_WORKERS', 0)) or os.cpu_count() or 1
+DEFAULT_THRESHOLD = int(os.environ.get('WAVE_PARALLEL_THRESHOLD', 200_000))
+
+
+def _evaluate(plot: Plot, xs: np.ndarray) -> np.ndarray:
+    return plot.evaluate(xs)
+
+
+def _picklable(plot: Plot) -> bool:
+    try:
+        pickle.dumps(plot)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+
+
+class Executor:
+    def __init__(self, workers: Optional[int] = None, threshold: int = DEFAULT_THRESHOLD) -> None:
+        self.workers = workers or DEFAULT_WORKERS
+        self.threshold = threshold
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    def evaluate(self, plot: Plot, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        if self.workers <= 1 or xs.size < self.threshold:
+            return plot.evaluate(xs)
+        chunks = np.array_split(xs.ravel(), self.workers)
+        return np.concatenate(list(self._pool(plot).map(_evaluate, [plot] * len(chunks), chunks))).reshape(xs.shape)
+
+    def _pool(self, plot: Plot) -> PoolExecutor:
+        # numpy releases the GIL, so vectorized plots scale on threads; segments with python callables need processes
+        if getattr(plot, 'vectorized', True) or not _picklable(plot):
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers)
+            return self._threads
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.workers)
+        return self._processes
+
+    def shutdown(self) -> None:
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown()
+        self._threads, self._processes = None, None
+
+
+EXECUTOR = Executor()
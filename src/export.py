@@ -0,0 +1,104 @@
+from __future__ import annotations
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional
+import numpy as np
+from src.datastructures import Range
+from src.executor import DEFAULT_WORKERS
+from src.problem import Problem, t_grid
+
+
+FRAME_SIZE = (8, 4.5)
+FRAME_DPI = 100
+FRAME_NAME = 'frame_{:05d}.png'
+FRAMES_PER_SECOND = 12
+SAMPLE_SPACING = 2
+COLORS = ['orange', 'blue', 'green']
+
+
+def _render(directory: str, first: int, plot_range: Range, title: str, x: np.ndarray, t: np.ndarray,
+            u: np.ndarray, phi_term: Optional[np.ndarray], psi_term: Optional[np.ndarray]) -> list[str]:
+    # runs in a worker process: a bare Agg canvas, so neither Qt nor pyplot's global state is involved
+    from matplotlib import ticker
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure(figsize=FRAME_SIZE, dpi=FRAME_DPI)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    ax.set_xlim(plot_range.x0-0.1, plot_range.x1+0.1)
+    ax.set_ylim(plot_range.y0-0.1, plot_range.y1+0.1)
+    ax.grid(True, alpha=0.2)
+    ax.xaxis.set_major_locator(ticker.MultipleLocator(1))
+    ax.yaxis.set_major_locator(ticker.MultipleLocator(1))
+    terms = [] if phi_term is None else [ax.plot(x, phi_term[0], color=COLORS[0])[0], ax.plot(x, psi_term[0], color=COLORS[1])[0]]
+    result, = ax.plot(x, u[0], color=COLORS[2])
+    paths = []
+    for i in range(len(t)):
+        if terms:
+            terms[0].set_ydata(phi_term[i])
+            terms[1].set_ydata(psi_term[i])
+        result.set_ydata(u[i])
+        ax.set_title(f'{title}, t = {t[i]:.2f}')
+        paths.append(os.path.join(directory, FRAME_NAME.format(first + i)))
+        canvas.print_png(paths[-1])
+    return paths
+
+
+def render_frames(problem: Problem, directory: str, t_values: np.ndarray | list[float],
+                  workers: Optional[int] = None, title: str = 'Result') -> list[str]:
+    # the field is solved once here; only the drawing, which dominates, is spread over the processes
+    t = np.asarray(t_values, dtype=float)
+    x = np.linspace(problem.plot_range.x0, problem.plot_range.x1, int(FRAME_SIZE[0] * FRAME_DPI) // SAMPLE_SPACING)
+    field = problem.solve(x, t)
+    os.makedirs(directory, exist_ok=True)
+    workers = workers or DEFAULT_WORKERS
+    chunks = [chunk for chunk in np.array_split(np.arange(len(t)), workers * 4) if len(chunk)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        futures = [pool.submit(_render, directory, int(chunk[0]), problem.plot_range, title, x, t[chunk], field.u[chunk],
+                               None if not field.analytic else field.phi_term[chunk],
+                               None if not field.analytic else field.psi_term[chunk]) for chunk in chunks]
+        return [path for future in futures for path in future.result()]
+
+
+def export(problem: Problem, output: str, t_values: np.ndarray | list[float], workers: Optional[int] = None,
+           fps: int = FRAMES_PER_SECOND) -> str:
+    # output ending in .gif or .mp4 is encoded (mp4 needs ffmpeg on the PATH), anything else is a directory
+    # of PNG frames; an mp4 without ffmpeg falls back to the frames next to it. Returns what was written.
+    extension = os.path.splitext(output)[1].lower()
+    if extension not in ('.gif', '.mp4'):
+        render_frames(problem, output, t_values, workers)
+        return output
+    if extension == '.mp4' and shutil.which('ffmpeg') is None:
+        directory = os.path.splitext(output)[0] + '_frames'
+        render_frames(problem, directory, t_values, workers)
+        return directory
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with tempfile.TemporaryDirectory() as directory:
+        frames = render_frames(problem, directory, t_values, workers)
+        if extension == '.gif':
+            from PIL import Image
+            images = [Image.open(frame) for frame in frames]
+            images[0].save(output, save_all=True, append_images=images[1:], duration=1000 // fps, loop=0)
+        else:
+            subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-framerate', str(fps),
+                            '-i', os.path.join(directory, FRAME_NAME.replace('{:05d}', '%05d')),
+                            '-pix_fmt', 'yuv420p', output], check=True)
+    return output
+
+
+def export_specs(spec_path: str, directory: str, extension: str = '.gif', workers: Optional[int] = None,
+                 t_values: Optional[np.ndarray | list[float]] = None) -> dict[str, str]:
+    # every problem of a --batch file as <directory>/<name><extension> (no extension: a directory of PNG frames),
+    # over the spec's t grid or t_values. Returns what was written for each name
+    from src.batch import load_specs, _filename
+    from src.widgets import T_VALUES
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    for spec in load_specs(spec_path):
+        written[spec['name']] = export(Problem.fromspec(spec), os.path.join(directory, _filename(spec['name'], extension)), 
+                                       t_grid(spec, T_VALUES if t_values is None else t_values), workers)
+    return written
@@ -0,0 +1,188 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+import numpy as np
+from src.datastructures import Plot
+
+
+OPERATIONS = {
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'div': np.true_divide,
+}
+
+
+
+
+class Expression(ABC):
+    __array_ufunc__ = None
+    vectorized = True
+    _kernel: Optional[Kernel] = None
+
+    @property
+    @abstractmethod
+    def key(self) -> tuple: ...
+
+    def _binary(self, operation: str, other: float | Plot | Expression, reflected: bool = False) -> Expression:
+        other = _wrap(other)
+        return Binary(operation, other, self) if reflected else Binary(operation, self, other)
+
+    def __add__(self, other: float | Plot | Expression) -> Expression: return self._binary('add', other)
+    def __sub__(self, other: float | Plot | Expression) -> Expression: return self._binary('sub', other)
+    def __mul__(self, other: float | Plot | Expression) -> Expression: return self._binary('mul', other)
+    def __truediv__(self, other: float | Plot | Expression) -> Expression: return self._binary('div', other)
+    def __radd__(self, other: float | Plot | Expression) -> Expression: return self._binary('add', other, True)
+    def __rsub__(self, other: float | Plot | Expression) -> Expression: return self._binary('sub', other, True)
+    def __rmul__(self, other: float | Plot | Expression) -> Expression: return self._binary('mul', other, True)
+    def __rtruediv__(self, other: float | Plot | Expression) -> Expression: return self._binary('div', other, True)
+    def __neg__(self) -> Expression: return self._binary('mul', -1)
+
+    def lazy(self) -> Expression:
+        return self
+
+    @abstractmethod
+    def shift(self, shift_amount: float) -> Expression: ...
+
+    @abstractmethod
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None: ...
+
+    def compile(self) -> Kernel:
+        if self._kernel is None:
+            self._kernel = Kernel(self)
+        return self._kernel
+
+    def evaluate(self, xs: np.ndarray | list[float]) -> np.ndarray:
+        xs = np.asarray(xs, dtype=float)
+        return np.broadcast_to(self.compile()(xs), xs.shape)
+
+    def __call__(self, x: float | np.ndarray) -> float | np.ndarray:
+        if isinstance(x, np.ndarray): return self.evaluate(x)
+        return float(self.evaluate(np.array([x]))[0])
+
+    @property
+    @abstractmethod
+    def start(self) -> float: ...
+    @property
+    @abstractmethod
+    def end(self) -> float: ...
+
+
+
+
+class Constant(Expression):
+    def __init__(self, value: float) -> None:
+        self.value = float(value)
+
+    @property
+    def key(self) -> tuple: return ('constant', self.value)
+    def shift(self, shift_amount: float) -> Constant: return self
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray: return np.empty(0)
+
+    @property
+    def start(self) -> float: return np.inf
+    @property
+    def end(self) -> float: return -np.inf
+    def __str__(self) -> str: return f"{self.value}"
+
+
+class Leaf(Expression):
+    def __init__(self, plot: Plot, shift_amount: float = 0) -> None:
+        self.plot = plot
+        self.shift_amount = float(shift_amount)
+
+    @property
+    def key(self) -> tuple: return ('leaf', id(self.plot), self.shift_amount)
+    def shift(self, shift_amount: float) -> Leaf: return Leaf(self.plot, self.shift_amount + shift_amount)
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None:
+        points = self.plot.breakpoints(x0 - self.shift_amount, x1 - self.shift_amount)
+        return None if points is None else points + self.shift_amount
+
+    @property
+    def start(self) -> float: return self.plot.start + self.shift_amount
+    @property
+    def end(self) -> float: return self.plot.end + self.shift_amount
+    def __str__(self) -> str: return f"plot_{id(self.plot):x}(x - {self.shift_amount})"
+
+
+class Binary(Expression):
+    def __init__(self, operation: str, left: Expression, right: Expression) -> None:
+        assert operation in OPERATIONS
+        self.operation = operation
+        self.left = left
+        self.right = right
+        self._key = (operation, left.key, right.key)
+
+    @property
+    def key(self) -> tuple: return self._key
+    def shift(self, shift_amount: float) -> Binary:
+        return Binary(self.operation, self.left.shift(shift_amount), self.right.shift(shift_amount))
+
+    def breakpoints(self, x0: float, x1: float) -> np.ndarray | None:
+        # only sums and products with constants stay piecewise-linear
+        if self.operation in ('mul', 'div') and not isinstance(self.right, Constant) and \
+                (self.operation == 'div' or not isinstance(self.left, Constant)):
+            return None
+        left, right = self.left.breakpoints(x0, x1), self.right.breakpoints(x0, x1)
+        if left is None or right is None: return None
+        return np.union1d(left, right)
+
+    @property
+    def start(self) -> float: return min(self.left.start, self.right.start)
+    @property
+    def end(self) -> float: return max(self.left.end, self.right.end)
+    def __str__(self) -> str: return f"{self.operation}({self.left}, {self.right})"
+
+
+def _wrap(value: float | Plot | Expression) -> Expression:
+    if isinstance(value, Expression): return value
+    if isinstance(value, Plot): return Leaf(value)
+    return Constant(value)
+
+
+def lazy(plot: Plot | Expression) -> Expression:
+    return _wrap(plot)
+
+
+
+
+class Kernel:
+    # Flattens the expression DAG once: every distinct (plot, shift) leaf and every distinct
+    # subexpression gets one slot, so shared terms are looked up and computed a single time per grid.
+    def __init__(self, expression: Expression) -> None:
+        self.leaves: list[tuple[int, Plot, float]] = []
+        self.constants: list[tuple[int, float]] = []
+        self.program: list[tuple[int, Callable, int, int]] = []
+        self._slots: dict[tuple, int] = {}
+        self.output = self._emit(expression)
+        del self._slots
+
+    def _emit(self, node: Expression) -> int:
+        if node.key in self._slots:
+            return self._slots[node.key]
+        if isinstance(node, Binary):
+            left, right = self._emit(node.left), self._emit(node.right)
+            slot = len(self._slots)
+            self.program.append((slot, OPERATIONS[node.operation], left, right))
+        else:
+            slot = len(self._slots)
+            if isinstance(node, Leaf):
+                self.leaves.append((slot, node.plot, node.shift_amount))
+            else:
+                self.constants.append((slot, node.value))
+        self._slots[node.key] = slot
+        return slot
+
+    @property
+    def size(self) -> int:
+        return len(self.leaves) + len(self.constants) + len(self.program)
+
+    def __call__(self, xs: np.ndarray) -> np.ndarray:
+        values: list[np.ndarray | float] = [0.0] * self.size
+        for slot, value in self.constants:
+            values[slot] = value
+        for slot, plot, shift_amount in self.leaves:
+            values[slot] = plot.evaluate(xs - shift_amount if shift_amount else xs)
+        for slot, operation, left, right in self.program:
+            values[slot] = operation(values[left], values[right])
+        return values[self.output]
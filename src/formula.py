@@ -0,0 +1,93 @@
+from __future__ import annotations
+import ast
+from typing import Callable
+import numpy as np
+
+
+FUNCTIONS = {
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan, 'atan2': np.arctan2,
+    'arcsin': np.arcsin, 'arccos': np.arccos, 'arctan': np.arctan, 'arctan2': np.arctan2,
+    'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+    'asinh': np.arcsinh, 'acosh': np.arccosh, 'atanh': np.arctanh,
+    'exp': np.exp, 'expm1': np.expm1, 'log': np.log, 'log10': np.log10, 'log2': np.log2, 'log1p': np.log1p,
+    'sqrt': np.sqrt, 'cbrt': np.cbrt, 'pow': np.power, 'hypot': np.hypot,
+    'abs': np.abs, 'fabs': np.abs, 'sign': np.sign, 'floor': np.floor, 'ceil': np.ceil, 'trunc': np.trunc,
+    'max': np.maximum, 'min': np.minimum, 'heaviside': lambda x, value=0.5: np.heaviside(x, value),
+}
+# how many arguments each function takes: a ufunc reads one more positional argument as the array to write into
+ARITIES = {name: (1,) for name in FUNCTIONS}
+ARITIES.update({name: (2,) for name in ('atan2', 'arctan2', 'pow', 'hypot', 'max', 'min')}, heaviside=(1, 2))
+CONSTANTS = {'pi': np.pi, 'e': np.e, 'tau': 2 * np.pi, 'inf': np.inf}
+VARIABLES = ('x',)
+
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.FloorDiv, ast.UAdd, ast.USub)
+
+
+class FormulaError(ValueError):
+    pass
+
+
+def _validate(tree: ast.AST, variables: tuple[str, ...]) -> None:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Load) + OPERATORS):
+            continue
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            continue
+        if isinstance(node, ast.Name) and (node.id in variables or node.id in CONSTANTS or node.id in FUNCTIONS):
+            continue
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+            continue
+        raise FormulaError(f'Unsupported element in formula: {ast.dump(node)}')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in FUNCTIONS and not _is_called(tree, node):
+            raise FormulaError(f'Function {node.id} must be called')
+        if isinstance(node, ast.Call) and len(node.args) not in ARITIES[node.func.id]:
+            raise FormulaError(f'Function {node.func.id} takes {" or ".join(map(str, ARITIES[node.func.id]))} '
+                               f'argument(s), {len(node.args)} given')
+
+
+def _is_called(tree: ast.AST, name: ast.Name) -> bool:
+    return any(isinstance(node, ast.Call) and node.func is name for node in ast.walk(tree))
+
+
+class _Numbers(ast.NodeTransformer):
+    # every number becomes a numpy float, so that powers of constants can neither grow into huge Python ints
+    # (10**10**10 would hang) nor raise on overflow, and nothing is folded into them at compile time
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        return ast.copy_location(ast.Call(ast.Name('_number', ast.Load()), [node], []), node)
+
+
+def compile_formula(text: str, variables: tuple[str, ...] = VARIABLES) -> Callable[..., np.ndarray]:
+    # The formula is parsed once into a restricted AST (numbers, the variables, the names above and arithmetic),
+    # and the resulting code runs over a whole numpy grid in one call; arguments follow the order of variables
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as error:
+        raise FormulaError(str(error)) from error
+    _validate(tree, variables)
+    code = compile(ast.fix_missing_locations(_Numbers().visit(tree)), '<formula>', 'eval')
+    namespace = {'__builtins__': {}, '_number': np.float64, **FUNCTIONS, **CONSTANTS}
+
+    def formula(*values: np.ndarray) -> np.ndarray:
+        assert len(values) == len(variables)
+        values = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in values))
+        with np.errstate(all='ignore'):
+            return np.broadcast_to(np.asarray(eval(code, namespace, dict(zip(variables, values))), dtype=float), values[0].shape)
+    return formula
+
+
+def bounded(formula: Callable[[np.ndarray], np.ndarray], bottom: float, top: float) -> Callable[[np.ndarray], np.ndarray]:
+    # singular points are held just outside the visible range; undefined ones (0/0 and the like) take the mean
+    # of the one-sided values next to them, and only what is still undefined after that falls back to zero
+    def function(x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        y = np.array(formula(x), dtype=float)
+        undefined = np.isnan(y)
+        if undefined.any():
+            step = 1e-9 * np.maximum(1, np.abs(x[undefined]))
+            y[undefined] = (formula(x[undefined] - step) + formula(x[undefined] + step)) / 2
+        return np.nan_to_num(y, nan=0.0, posinf=top + 2, neginf=bottom - 2)
+    return function
@@ -0,0 +1,80 @@
+from __future__ import annotations
+from typing import Any, Callable, Hashable, Optional
+
+
+_STALE = object()
+
+
+
+
+class Node:
+    # A memoized step of the refresh chain: computed from the values of its dependencies on first use
+    # and kept until one of them changes, which marks it and everything built on it stale
+    def __init__(self, name: str, compute: Optional[Callable[..., Any]], *dependencies: Node) -> None:
+        self.name = name
+        self.compute = compute
+        self.dependencies = dependencies
+        self.dependants: list[Node] = []
+        self.computations = 0
+        self._value = _STALE
+        for dependency in dependencies:
+            dependency.dependants.append(self)
+
+    @property
+    def stale(self) -> bool:
+        return self._value is _STALE
+
+    @property
+    def value(self) -> Any:
+        if self._value is _STALE:
+            self._value = self.compute(*(dependency.value for dependency in self.dependencies))
+            self.computations += 1
+        return self._value
+
+    def invalidate(self) -> None:
+        # a stale node has stale dependants already, nothing was computed from it since
+        if self._value is _STALE:
+            return
+        self._value = _STALE
+        self._invalidate_dependants()
+
+    def _invalidate_dependants(self) -> None:
+        for dependant in self.dependants:
+            dependant.invalidate()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r}{', stale' if self.stale else ''})"
+
+
+
+
+class Input(Node):
+    # A parameter of the chain. Setting an equal value (compared by key, identity for plots) keeps the dependants
+    def __init__(self, name: str, value: Any = None, key: Optional[Callable[[Any], Hashable]] = None) -> None:
+        super().__init__(name, None)
+        self.key = key
+        self._value = value
+
+    @property
+    def value(self) -> Any:
+        return self._value
+
+    def set(self, value: Any) -> bool:
+        if self._same(value):
+            return False
+        self._value = value
+        self._invalidate_dependants()
+        return True
+
+    def invalidate(self) -> None:
+        self._invalidate_dependants()
+
+    def _same(self, value: Any) -> bool:
+        if value is self._value:
+            return True
+        if self.key is not None:
+            return self.key(value) == self.key(self._value)
+        try:
+            return bool(type(value) is type(self._value) and value == self._value)
+        except (TypeError, ValueError):
+            return False
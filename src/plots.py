@@ -1,4 +1,6 @@
 from __future__ import annotations
+from bisect import insort
+from operator import itemgetter
 import matplotlib.pyplot as plt
 from typing import Optional
 from matplotlib import ticker
@@ -6,32 +8,134 @@ from matplotlib import patches
 from matplotlib import path
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from PyQt5.QtCore import pyqtSignal, QObject, Qt
-from src.datastructures import Plot, Range, Segment, create_functions
+from src.datastructures import Plot, LinearPlot, FunctionPlot, ReflectedPlot, Range
+from src.executor import EXECUTOR
+from src.expressions import Expression
+from src.profiling import STATS
 from typing import Callable, List
 import numpy as np
 # matplotlib.use('Qt5Agg')
 
 
+SAMPLE_SPACING = 2
+SAMPLING_TOLERANCE = 0.25
+MAX_REFINEMENTS = 4
+
+
+def axes_pixels(ax) -> tuple[int, int]:
+    width, height = ax.figure.canvas.get_width_height()
+    ratio = getattr(ax.figure.canvas, 'device_pixel_ratio', 1)
+    position = ax.get_position()
+    return max(int(width * ratio * position.width), 1), max(int(height * ratio * position.height), 1)
+
+
+def sample_grid(range: Range, pixels: Optional[int] = None) -> np.ndarray:
+    if pixels is None:
+        return np.linspace(range.x0, range.x1, num=int(100 * range.x_length()))
+    return np.linspace(range.x0, range.x1, num=max(pixels // SAMPLE_SPACING, 2))
+
+
+def exact_vertices(plot: Plot | Expression, plot_range: Range) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    # Piecewise-linear curves are drawn exactly from their breakpoints; a jump gets both of its one-sided values
+    points = plot.breakpoints(plot_range.x0, plot_range.x1)
+    if points is None:
+        return None
+    x = np.unique(np.concatenate(([plot_range.x0, plot_range.x1], points)))
+    STATS.count('samples', 3 * len(x))
+    delta = 1e-9 * np.maximum(1, np.abs(x))
+    y, left, right = plot.evaluate(x), plot.evaluate(x - delta), plot.evaluate(x + delta)
+    jump = ~np.isclose(left, right, rtol=1e-6, atol=1e-9) & (x > plot_range.x0) & (x < plot_range.x1)
+    first = np.cumsum(1 + jump) - 1 - jump
+    vertices, values = np.repeat(x, 1 + jump), np.empty(len(x) + jump.sum())
+    values[first] = np.where(jump, left, y)
+    values[first + jump] = np.where(jump, right, y)
+    return vertices, values
+
+
+def adaptive_samples(plot: Plot | Expression, plot_range: Range, pixels: int, tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    # Starts from one sample every SAMPLE_SPACING device pixels and halves only the intervals whose midpoint
+    # is further than tolerance from the chord, which happens at breakpoints and in strongly curved parts
+    x = sample_grid(plot_range, pixels)
+    y = EXECUTOR.evaluate(plot, x)
+    for _ in range(MAX_REFINEMENTS):
+        middle = (x[:-1] + x[1:]) / 2
+        coarse = np.abs(EXECUTOR.evaluate(plot, middle) - (y[:-1] + y[1:]) / 2) > tolerance
+        if not coarse.any():
+            break
+        x = np.insert(x, np.flatnonzero(coarse) + 1, middle[coarse])
+        y = EXECUTOR.evaluate(plot, x)
+        STATS.count('samples', len(middle))
+    STATS.count('samples', 2 * len(x))
+    return x, y
+
+
+
+
+class Blitter:
+    # Keeps the static part of an axes (frame, grid, ticks, title) as a cached background and redraws only the animated lines
+    def __init__(self, canvas: FigureCanvasQTAgg, ax, lines: list) -> None:
+        self.canvas = canvas
+        self.ax = ax
+        self.lines = lines
+        self.background = None
+        for line in self.lines:
+            line.set_animated(True)
+        self._connection = self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event) -> None:
+        if self.ax.figure is None or self.ax not in self.canvas.figure.axes:
+            self.canvas.mpl_disconnect(self._connection)
+            return
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self) -> None:
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    @STATS.timed('blit')
+    def update(self) -> None:
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_lines()
+        self.canvas.blit(self.ax.bbox)
+
+
+
+
 class DynamicPlot():
     def __init__(self, ax, plot: Plot, color: str = 'black') -> None:
         self.x = np.arange(0, 1)
         self.y = np.arange(0, 1)
         self.color = color
         self.plot = plot
+        self.ax = ax
         self.line, = ax.plot(self.x, self.y, color=self.color)
 
-    def refresh(self, range: Range, a: Optional[float] = None, t: Optional[float] = None) -> Optional[Plot]:
-        self.x = np.linspace(range.x0, range.x1, num=int(100 * range.x_length()))
+    def refresh(self, range: Range, a: Optional[float] = None, t: Optional[float] = None) -> Expression:
+        shifted_plot = self.plot.lazy()
         if t is not None and t != 0:
-            shifted_plot = self.plot.shift(a * t)
-            self.y = np.array([shifted_plot(x) for x in self.x])
+            shifted_plot = shifted_plot.shift(a * t)
+        vertices = exact_vertices(shifted_plot, range)
+        if vertices is not None:
+            self.x, self.y = vertices
         else:
-            self.y = np.array([self.plot(x) for x in self.x])
+            width, height = axes_pixels(self.ax)
+            bottom, top = range.y0 - 0.1, range.y1 + 0.1
+            self.x, self.y = adaptive_samples(shifted_plot, range, width, SAMPLING_TOLERANCE * (top - bottom) / height)
         self.line.set_xdata(self.x)
         self.line.set_ydata(self.y)
-        if t is not None and t != 0:
-            return shifted_plot
-        return self.plot
+        return shifted_plot
+
+    def show(self, x: np.ndarray, y: np.ndarray) -> None:
+        self.x, self.y = x, y
+        self.line.set_data(self.x, self.y)
+
+    def show_exact(self, plot: Plot | Expression, range: Range, x: np.ndarray, y: np.ndarray) -> None:
+        vertices = exact_vertices(plot, range)
+        self.show(*(vertices if vertices is not None else (x, y)))
     
     @property
     def x(self) -> np.ndarray:
@@ -67,6 +171,7 @@ class PlotInput(QObject):
         self.ax = self.figure.add_subplot(111)
         self.range = range
         self.redraw_axes()
+        self.patch = self.ax.add_patch(patches.PathPatch(path.Path(self.verts, self.codes), facecolor='none'))
         if initial_plot is not None:
             self.initial_draw(initial_plot)
 
@@ -89,19 +194,26 @@ class PlotInput(QObject):
 
 
     def initial_draw(self, plot: Plot) -> None:
-        self.verts = [[self.range.x0, 0]] + [[segment.x1, segment(segment.x1)] for segment in plot.segments] + [[self.range.x1, 0]]
-        self.codes = [path.Path.MOVETO, path.Path.LINETO] + [path.Path.LINETO] * len(plot.segments)
+        if isinstance(plot, ReflectedPlot):
+            plot = plot.base
+        if isinstance(plot, FunctionPlot):
+            plot = plot.linearize()
+        if isinstance(plot, LinearPlot):
+            points = [[float(x), float(y)] for x, y in zip(plot.x[1:], plot.y[1:])]
+        else:
+            points = [[segment.x1, segment(segment.x1)] for segment in plot.segments]
+        self.verts = [[self.range.x0, 0]] + points + [[self.range.x1, 0]]
+        self.codes = [path.Path.MOVETO, path.Path.LINETO] + [path.Path.LINETO] * len(points)
         self.refresh()
 
         
     def on_click(self, event) -> None:
         if event.inaxes == self.ax and self.isEnabled:
-            self.redraw_axes()
             x, y = (float(event.xdata) * 4 + 1) // 2 / 2, (float(event.ydata) * 4 + 1) // 2 / 2
+            # after the vertices with the same x, as the stable sort did: a repeated x is a jump
+            insort(self.verts, [x, y], key=itemgetter(0))
             self.codes.append(path.Path.LINETO)
-            self.verts.append([x, y])
-            self.verts = sorted(self.verts, key=lambda p: p[0])
-            self.refresh()
+            self.update_path()
             self.canvas.setFocus()
 
         
@@ -109,11 +221,14 @@ class PlotInput(QObject):
         self.figure.clear()
         self.ax = self.figure.add_subplot(111)
         self.redraw_axes()
-        path_plot = path.Path(self.verts, self.codes)
-        patch = patches.PathPatch(path_plot, facecolor='none')
-        self.ax.add_patch(patch)
+        self.patch = self.ax.add_patch(patches.PathPatch(path.Path(self.verts, self.codes), facecolor='none'))
         self.canvas.draw()
 
+    def update_path(self) -> None:
+        # vertex edits only swap the path of the patch, the axes are not rebuilt
+        self.patch.set_path(path.Path(self.verts, self.codes))
+        self.canvas.draw_idle()
+
     
     def on_key_press(self, event) -> None:
         if event.key in ['enter', ' '] and self.isEnabled:
@@ -123,18 +238,14 @@ class PlotInput(QObject):
             if len(self.verts) <= 2: return
             self.verts.pop(-2)
             self.codes.pop(-2)
-            self.refresh()
+            self.update_path()
             return
     
 
-    def get_plot(self) -> list[Segment] | list:
+    def get_plot(self) -> LinearPlot | list:
         if len(self.verts) <= 0:
             return []
-        array =  Plot([Segment(self.verts[i][0], self.verts[i + 1][0],\
-                    create_functions(self.verts[i][0], self.verts[i + 1][0], \
-                    self.verts[i][1], self.verts[i + 1][1])) for i in range(len(self.verts) - 1) \
-                    if self.verts[i][0] != self.verts[i + 1][0]])
-        return array
+        return Plot.fromlists([vert[0] for vert in self.verts], [vert[1] for vert in self.verts]).simplify()
         
     
     def show(self) -> None:
@@ -205,34 +316,78 @@ class WavePlot:
         self.plot2 = DynamicPlot(self.ax, main_plot, color=self.colors[1])
         
         # Plot 3: function(g(x-at), g(x+at))
-        combined_plot = self.function(main_plot, main_plot, 1)
+        combined_plot = self.function(main_plot.lazy(), main_plot.lazy(), 1)
         self.plot3 = DynamicPlot(self.ax, combined_plot, color=self.colors[2])
 
+        self.range = None
+        self.blitter = Blitter(self.canvas, self.ax, [self.plot1.line, self.plot2.line, self.plot3.line])
         self.canvas.draw()
     
-    def refresh(self, a: float, t: float, range: Range) -> None:
-        if self.plot2.plot.start > (range.x0 - a * t):
-            self.plot2.plot = self.plot2.plot.extend(2 * a * t)
-        if self.plot1.plot.end < (range.x1 + a * t):
-            self.plot1.plot = self.plot1.plot.extend(2 * a * t)
+    @STATS.timed('wave plots')
+    def show(self, range: Range, a: float, t: float, x: np.ndarray, y_minus: np.ndarray, y_plus: np.ndarray, 
+             y_combined: np.ndarray) -> Expression:
+        plot_minus = self.main_plot.lazy().shift(a * t)
+        plot_plus = self.main_plot.lazy().shift(-a * t)
+        combined_plot = self.function(plot_minus, plot_plus, a)
+        self.plot1.show_exact(plot_minus, range, x, y_minus)
+        self.plot2.show_exact(plot_plus, range, x, y_plus)
+        self.plot3.show_exact(combined_plot, range, x, y_combined)
+        self.redraw(range)
+        return combined_plot
+
+    def redraw(self, range: Range) -> None:
+        if range == self.range:
+            self.blitter.update()
+            return
+        self.redraw_axes(range)
+        with STATS.stage('draw'):
+            self.canvas.draw()
+
+    def redraw_axes(self, range: Range) -> None:
+        self.range = range
         self.ax.set_xlim(range.x0-0.1, range.x1+0.1)
         self.ax.set_ylim(range.y0-0.1, range.y1+0.1)
         self.ax.grid(True, alpha=0.2)
         self.ax.xaxis.set_major_locator(ticker.MultipleLocator(1))
         self.ax.yaxis.set_major_locator(ticker.MultipleLocator(1))
-        plot_plus = self.plot1.refresh(range, a=a, t=t)
-        plot_minus = self.plot2.refresh(range, a=a, t=-t)
-        self.plot3.line.remove()
-        combined_plot = self.function(plot_plus, plot_minus, a)
-        self.plot3 = DynamicPlot(self.ax, combined_plot, color=self.colors[2])
-        self.plot3.refresh(range)
-        self.canvas.draw()
 
     def get_plots(self) -> list[Plot]:
         return [self.plot1.get_plot(), self.plot2.get_plot(), self.plot3.get_plot()]
     
 
 
+class SourcePlot:
+    # the source f(x, t) at the current t and the Duhamel term it has built up by then
+    def __init__(self, figure: plt.Figure, canvas: FigureCanvasQTAgg, title: str, colors: List[str] = ['gray', 'green']) -> None:
+        self.figure = figure
+        self.canvas = canvas
+        self.colors = colors
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_title(title)
+        self.source = DynamicPlot(self.ax, None, color=self.colors[0])
+        self.term = DynamicPlot(self.ax, None, color=self.colors[1])
+
+        self.range = None
+        self.blitter = Blitter(self.canvas, self.ax, [self.source.line, self.term.line])
+        self.canvas.draw()
+
+    @STATS.timed('source plot')
+    def show(self, range: Range, x: np.ndarray, y_source: np.ndarray, y_term: np.ndarray) -> None:
+        self.source.show(x, y_source)
+        self.term.show(x, y_term)
+        if range == self.range:
+            self.blitter.update()
+            return
+        self.range = range
+        self.ax.set_xlim(range.x0-0.1, range.x1+0.1)
+        self.ax.set_ylim(range.y0-0.1, range.y1+0.1)
+        self.ax.grid(True, alpha=0.2)
+        self.ax.xaxis.set_major_locator(ticker.MultipleLocator(1))
+        self.ax.yaxis.set_major_locator(ticker.MultipleLocator(1))
+        with STATS.stage('draw'):
+            self.canvas.draw()
+
+
 class ResultPlot:
     def __init__(self, figure: plt.Figure, canvas: FigureCanvasQTAgg, plot1: Plot, plot2: Plot, range: Range, title: str, 
                  function: Callable[[Plot, Plot], Plot] | Callable[[Plot, Plot, Plot], Plot], plot3: Optional[Plot] = None,
@@ -266,8 +421,23 @@ class ResultPlot:
         self.plot_result = DynamicPlot(self.ax, combined_plot, color=self.colors[2])
         self.plot_result.refresh(range)
 
+        lines = [self.plot1.line, self.plot2.line, self.plot_result.line] + ([self.plot3.line] if self.plot3_exists else [])
+        self.blitter = Blitter(self.canvas, self.ax, lines)
         self.canvas.draw()
 
+    @STATS.timed('result plot')
+    def show(self, range: Range, x: np.ndarray, y1: np.ndarray, y2: np.ndarray, y_result: np.ndarray, 
+             plot1: Optional[Expression] = None, plot2: Optional[Expression] = None) -> None:
+        if plot1 is None or plot2 is None:
+            self.plot1.show(x, y1)
+            self.plot2.show(x, y2)
+            self.plot_result.show(x, y_result)
+        else:
+            self.plot1.show_exact(plot1, range, x, y1)
+            self.plot2.show_exact(plot2, range, x, y2)
+            self.plot_result.show_exact(self.function(plot1, plot2), range, x, y_result)
+        self.blitter.update()
+
     def get_plots(self) -> list[Plot]:
         if self.plot3_exists:
             return [self.plot1.get_plot(), self.plot2.get_plot(), self.plot3.get_plot(), self.plot_result.get_plot()]
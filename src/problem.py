@@ -0,0 +1,81 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+import numpy as np
+from src.datastructures import Plot, LinearPlot, FunctionPlot, Range
+from src.formula import compile_formula, bounded
+from src.solver import SOLVERS, Solution
+
+
+DEFAULT_RANGE = (-5, 5, -2, 2)
+
+
+
+
+@dataclass
+class Problem:
+    # Everything the window solves for: the initial data, a² (a number, or a function of x for the scheme),
+    # the constraints, the plotted range, an optional source f(x, t) and the solver to use
+    phi: Plot
+    psi: Plot
+    a_squared: float | Callable[[np.ndarray], np.ndarray] = 1.0
+    left: Optional[tuple[str, float]] = None
+    right: Optional[tuple[str, float]] = None
+    plot_range: Range = field(default_factory=lambda: Range(*DEFAULT_RANGE))
+    source: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+    solver: str = 'analytic'
+    # φ extended by the constraints and Ф, to reuse for the d'Alembert formula instead of building them again
+    extended: Optional[tuple[Plot, Plot]] = None
+
+    @property
+    def method(self) -> str:
+        # the d'Alembert formula only exists for a constant a²
+        return 'finite differences' if callable(self.a_squared) else self.solver
+
+    def solve(self, x: np.ndarray | list[float], t: np.ndarray | list[float] | float) -> Solution:
+        options = {'extended': self.extended} if self.method == 'analytic' and self.extended is not None else {}
+        return SOLVERS[self.method](self.phi, self.psi, self.a_squared, self.left, self.right, source=self.source, **options).solve(x, t)
+
+    @classmethod
+    def fromspec(cls, spec: dict[str, Any]) -> Problem:
+        # phi/psi: a formula in x or a list of [x, y] vertices; a_squared: a number or a formula in x;
+        # left/right: [type, x0] or {"type": ..., "x0": ...}; range: [x0, x1, y0, y1]; f: a formula in x and t;
+        # simplify: how far vertex lists may be decimated along y (collinear vertices are always merged)
+        plot_range = Range(*spec.get('range', DEFAULT_RANGE))
+        tolerance = float(spec.get('simplify', 0.0))
+        a_squared = spec.get('a_squared', 1.0)
+        if isinstance(a_squared, str):
+            a_squared = compile_formula(a_squared)
+        source = spec.get('f')
+        return cls(_plot(spec.get('phi', 0), plot_range, tolerance), _plot(spec.get('psi', 0), plot_range, tolerance),
+                   float(a_squared) if not callable(a_squared) else a_squared,
+                   _constraint(spec.get('left')), _constraint(spec.get('right')), plot_range,
+                   compile_formula(source, ('x', 't')) if source not in (None, '', '0', 0) else None,
+                   spec.get('solver', 'analytic'))
+
+
+def _plot(spec: str | float | list[list[float]], plot_range: Range, tolerance: float = 0.0) -> Plot:
+    if isinstance(spec, (int, float)):
+        return LinearPlot([plot_range.x0, plot_range.x1], [spec, spec])
+    if isinstance(spec, str):
+        return FunctionPlot(bounded(compile_formula(spec), plot_range.y0, plot_range.y1), plot_range.x0, plot_range.x1,
+                            f'{spec}|{plot_range.y0}|{plot_range.y1}')
+    vertices = np.asarray(spec, dtype=float)
+    return LinearPlot(vertices[:, 0], vertices[:, 1]).simplify(tolerance)
+
+
+def _constraint(spec: Optional[list | dict]) -> Optional[tuple[str, float]]:
+    if spec is None:
+        return None
+    constraint_type, x0 = (spec['type'], spec.get('x0')) if isinstance(spec, dict) else spec
+    return None if constraint_type == 'none' else (constraint_type, float(x0))
+
+
+def t_grid(spec: dict[str, Any], default: np.ndarray) -> np.ndarray:
+    # t: a list of values, or {"start": ..., "stop": ..., "step": ...} with stop included
+    t = spec.get('t')
+    if t is None:
+        return default
+    if isinstance(t, dict):
+        return np.arange(t.get('start', 0), t['stop'] + t['step'] / 2, t['step'])
+    return np.asarray(t, dtype=float)
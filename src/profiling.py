@@ -0,0 +1,146 @@
+from __future__ import annotations
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from functools import wraps
+from inspect import signature
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Iterator, Optional
+
+
+PROFILE_PATH = os.environ.get('WAVE_PROFILE')
+HUD = os.environ.get('WAVE_HUD', '') not in ('', '0')
+FPS_WINDOW = 30
+PROFILE_LINES = 60
+
+
+
+
+@dataclass
+class Timer:
+    calls: int = 0
+    total: float = 0.0
+    last: float = 0.0
+    worst: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.total += seconds
+        self.last = seconds
+        self.worst = max(self.worst, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+class Stats:
+    # Wall-clock timers per stage of the refresh chain, counters of the work done in them and the frame rate.
+    # A stage costs two perf_counter calls, so it is always on.
+    def __init__(self) -> None:
+        self.timers: dict[str, Timer] = {}
+        self.counters: dict[str, int] = {}
+        self._frames: deque[float] = deque(maxlen=FPS_WINDOW)
+        self._lock = Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start)
+
+    def timed(self, name: str, slot: bool = False) -> Callable[[Callable], Callable]:
+        def decorator(function: Callable) -> Callable:
+            # Qt passes a slot only the signal arguments its signature takes, which it cannot see through the wrapper,
+            # so a slot's wrapper drops the surplus ones itself
+            parameters = signature(function).parameters.values()
+            accepted = None if not slot or any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters) else \
+                sum(parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD) for parameter in parameters)
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args[:accepted], **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = Timer()
+            timer.add(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+    def set(self, name: str, value: int) -> None:
+        with self._lock:
+            self.counters[name] = int(value)
+
+    def frame(self) -> None:
+        with self._lock:
+            self._frames.append(perf_counter())
+
+    @property
+    def fps(self) -> float:
+        with self._lock:
+            frames = list(self._frames)
+        if len(frames) < 2: return 0.0
+        return (len(frames) - 1) / max(frames[-1] - frames[0], 1e-9)
+
+    def _snapshot(self) -> tuple[dict[str, Timer], dict[str, int]]:
+        # the worker thread records while the GUI thread reads
+        with self._lock:
+            return {name: Timer(**asdict(timer)) for name, timer in self.timers.items()}, dict(self.counters)
+
+    def summary(self) -> dict:
+        timers, counters = self._snapshot()
+        return {'timers': {name: {**asdict(timer), 'mean': timer.mean} for name, timer in timers.items()},
+                'counters': counters, 'fps': self.fps}
+
+    def text(self) -> str:
+        timers, counters = self._snapshot()
+        lines = [f'{name:<22}{timer.last * 1e3:8.1f} ms  (mean {timer.mean * 1e3:.1f})' for name, timer in timers.items()]
+        lines += [f'{name:<22}{value:>8}' for name, value in counters.items()]
+        return '\n'.join(lines + [f"{'FPS':<22}{self.fps:8.1f}"])
+
+    def reset(self) -> None:
+        with self._lock:
+            self.timers.clear()
+            self.counters.clear()
+            self._frames.clear()
+
+
+STATS = Stats()
+
+
+def install_profiler(path: Optional[str] = PROFILE_PATH) -> Optional[cProfile.Profile]:
+    # WAVE_PROFILE=<file> profiles the whole session: <file> gets the raw cProfile data (for pstats or snakeviz),
+    # <file>.txt the slowest calls by cumulative time and <file>.json the stage timers and counters
+    if not path:
+        return None
+    profiler = cProfile.Profile()
+
+    def dump() -> None:
+        profiler.disable()
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        with open(f'{path}.txt', 'w', encoding='utf-8') as file:
+            file.write(STATS.text() + '\n\n' + report.getvalue())
+        with open(f'{path}.json', 'w', encoding='utf-8') as file:
+            json.dump(STATS.summary(), file, indent=1)
+    atexit.register(dump)
+    profiler.enable()
+    return profiler
@@ -0,0 +1,281 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Optional
+import numpy as np
+from src.datastructures import Plot, ReflectedPlot, fold
+from src.executor import EXECUTOR, Executor
+from src.profiling import STATS
+
+
+BOUNDARY_TYPES = ('none', 'odd', 'even')
+DUHAMEL_NODES = 1024
+FD_CELLS = 2000
+COURANT = 0.9
+
+
+def _constraint(constraint: Optional[tuple[str, float]]) -> Optional[tuple[str, float]]:
+    return None if constraint is None or constraint[0] == 'none' else constraint
+
+
+def extend_plot(plot: Plot, left: Optional[tuple[str, float]] = None, right: Optional[tuple[str, float]] = None) -> Plot:
+    left, right = _constraint(left), _constraint(right)
+    if plot is None or (left is None and right is None):
+        return plot
+    return ReflectedPlot(plot, left, right)
+
+
+
+
+@dataclass
+class Solution:
+    x: np.ndarray
+    t: np.ndarray
+    a: float
+    phi_plus: Optional[np.ndarray]
+    phi_minus: Optional[np.ndarray]
+    Phi_plus: Optional[np.ndarray]
+    Phi_minus: Optional[np.ndarray]
+    f_term: Optional[np.ndarray] = None
+    # set instead of the d'Alembert terms by solvers that march U itself
+    u_field: Optional[np.ndarray] = None
+
+    @property
+    def analytic(self) -> bool:
+        return self.u_field is None
+
+    @property
+    def phi_term(self) -> np.ndarray:
+        return (self.phi_plus + self.phi_minus) / 2
+    @property
+    def psi_term(self) -> np.ndarray:
+        return (self.Phi_plus - self.Phi_minus) / (2 * self.a)
+    @property
+    def u(self) -> np.ndarray:
+        if self.u_field is not None:
+            return self.u_field
+        if self.f_term is None:
+            return self.phi_term + self.psi_term
+        return self.phi_term + self.psi_term + self.f_term
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._fields() if array is not None)
+
+    def _fields(self) -> tuple[Optional[np.ndarray], ...]:
+        return self.phi_plus, self.phi_minus, self.Phi_plus, self.Phi_minus, self.f_term, self.u_field
+
+    def row(self, index: int) -> Solution:
+        rows = slice(index, index + 1)
+        return Solution(self.x, self.t[rows], self.a, *(None if array is None else array[rows] for array in self._fields()))
+
+    def index(self, t: float) -> int:
+        return int(np.clip(np.searchsorted(self.t, t), 0, len(self.t) - 1))
+
+
+
+
+class DuhamelTerm:
+    # 1/2a ∬ f(y, s) over the characteristic triangle of (x, t). In ξ = y + as, η = y - as that triangle is
+    # {x - at <= η <= ξ <= x + at} and dy ds = dξ dη / 2a, so one summed-area table of f over ξ >= η answers
+    # every (x, t) with a single lookup. f is extended past the constraints like φ and ψ.
+
+    # The extended f jumps across every reflection line y = c, i.e. ξ + η = 2c. The grid is laid so that those
+    # are anti-diagonals of cells, and each cell is integrated as its two anti-diagonal halves by the centroid
+    # rule, so no sample lies on a jump
+    CELL_POINTS = ((1 / 3, 1 / 3), (2 / 3, 2 / 3))
+    # the same for the half ξ >= η of a cell on the diagonal, cut into two quarters by its anti-diagonal
+    DIAGONAL_POINTS = ((1 / 2, 1 / 6), (5 / 6, 1 / 2))
+
+    def __init__(self, source: Callable[[np.ndarray, np.ndarray], np.ndarray], a: float, x0: float, x1: float, t_max: float, 
+                 left: Optional[tuple[str, float]] = None, right: Optional[tuple[str, float]] = None, 
+                 nodes: int = DUHAMEL_NODES) -> None:
+        self.a = a
+        self.left, self.right = _constraint(left), _constraint(right)
+        start, end = x0 - a * t_max, x1 + a * t_max
+        step = (end - start) / (nodes - 1)
+        reflections = [constraint[1] for constraint in (self.left, self.right) if constraint is not None]
+        # with two constraints the lines repeat every L in y, so the step has to divide 2L
+        # (on a grid coarser than that the period of f is not resolved anyway, and the lines are left unaligned)
+        length = reflections[-1] - reflections[0] if reflections else 0.0
+        if reflections and (len(reflections) == 1 or 2 * length >= step):
+            if len(reflections) == 2:
+                step = 2 * length / np.ceil(2 * length / step)
+            start = reflections[0] - np.ceil(2 * (reflections[0] - start) / step) * step / 2
+            nodes = int(np.ceil((end - start) / step - 1e-9)) + 1
+        self.nodes = start + step * np.arange(nodes)
+        self.step = step
+        corner = self.nodes[:-1]
+        cells = sum(self._sample(source, corner[:, None] + p * step, corner[None, :] + q * step) for p, q in self.CELL_POINTS)
+        cells = np.tril(cells, -1) * step ** 2 / 2
+        diagonal = np.arange(nodes - 1)
+        cells[diagonal, diagonal] = sum(self._sample(source, corner + p * step, corner + q * step) 
+                                        for p, q in self.DIAGONAL_POINTS) * step ** 2 / 4
+        # table[I, J] = sum of the cells with i < I and j >= J
+        self.table = np.zeros((nodes, nodes))
+        self.table[1:, :-1] = np.cumsum(np.cumsum(cells, axis=0)[:, ::-1], axis=1)[:, ::-1] / (4 * a ** 2)
+
+    def _sample(self, source: Callable[[np.ndarray, np.ndarray], np.ndarray], xi: np.ndarray, eta: np.ndarray) -> np.ndarray:
+        y, s = (xi + eta) / 2, np.maximum(xi - eta, 0) / (2 * self.a)
+        if self.left is None and self.right is None:
+            f = np.asarray(source(y, s), dtype=float)
+        else:
+            u, sign, _, _ = fold(y, self.left, self.right)
+            f = sign * source(u, s)
+        return np.where(np.isfinite(f), f, 0.0)
+
+    def evaluate(self, x: np.ndarray, t: np.ndarray) -> np.ndarray:
+        i = np.clip((x + self.a * t - self.nodes[0]) / self.step, 0, len(self.nodes) - 1)
+        j = np.clip((x - self.a * t - self.nodes[0]) / self.step, 0, len(self.nodes) - 1)
+        i0, j0 = np.minimum(i.astype(int), len(self.nodes) - 2), np.minimum(j.astype(int), len(self.nodes) - 2)
+        p, q = i - i0, j - j0
+        table = self.table
+        return (table[i0, j0] * (1 - p) * (1 - q) + table[i0 + 1, j0] * p * (1 - q) + 
+                table[i0, j0 + 1] * (1 - p) * q + table[i0 + 1, j0 + 1] * p * q)
+
+
+
+
+class WaveSolver:
+    # d'Alembert: U = 1/2 (φ(x + at) + φ(x - at)) + 1/2a (Ф(x + at) - Ф(x - at)), with φ, ψ extended by the boundary types,
+    # plus the Duhamel term of the source f(x, t) when there is one
+    def __init__(self, phi: Plot, psi: Plot, a_squared: float, left: Optional[tuple[str, float]] = None, 
+                 right: Optional[tuple[str, float]] = None, executor: Optional[Executor] = None, 
+                 source: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None, 
+                 extended: Optional[tuple[Plot, Plot]] = None) -> None:
+        # extended: φ extended by the constraints and Ф, when the caller has them already
+        assert a_squared > 0
+        for constraint in (left, right):
+            assert constraint is None or constraint[0] in BOUNDARY_TYPES
+        self.a = a_squared ** 0.5
+        self.left = left
+        self.right = right
+        self.executor = executor or EXECUTOR
+        self.source = source
+        self.psi = extend_plot(psi, left, right)
+        if extended is None:
+            self.phi, self.Phi = extend_plot(phi, left, right), self.psi.integrate()
+        else:
+            self.phi, self.Phi = extended
+
+    @STATS.timed('solve')
+    def solve(self, x: np.ndarray | list[float], t: np.ndarray | list[float] | float) -> Solution:
+        x, t = np.atleast_1d(np.asarray(x, dtype=float)), np.atleast_1d(np.asarray(t, dtype=float))
+        STATS.count('field values', x.size * t.size)
+        plus = x[None, :] + self.a * t[:, None]
+        minus = x[None, :] - self.a * t[:, None]
+        f_term = None
+        if self.source is not None:
+            f_term = DuhamelTerm(self.source, self.a, x.min(), x.max(), t.max(), self.left, self.right).evaluate(x[None, :], t[:, None])
+        return Solution(x, t, self.a, self.executor.evaluate(self.phi, plus), self.executor.evaluate(self.phi, minus), 
+                        self.executor.evaluate(self.Phi, plus), self.executor.evaluate(self.Phi, minus), f_term)
+
+    def __call__(self, x: np.ndarray | list[float], t: np.ndarray | list[float] | float) -> np.ndarray:
+        return self.solve(x, t).u
+
+
+
+
+class FiniteDifferenceSolver:
+    # Explicit leapfrog for Utt = a²(x) Uxx + f(x, t): a cross-check for the analytic path at large t and the only
+    # option when a² depends on x. 'odd' constraints pin U to zero at x0 (Dirichlet), 'even' ones mirror the
+    # neighbouring node (Neumann); an unconstrained side is moved out of reach of any wave within t.
+    def __init__(self, phi: Plot, psi: Plot, a_squared: float | Callable[[np.ndarray], np.ndarray], 
+                 left: Optional[tuple[str, float]] = None, right: Optional[tuple[str, float]] = None, 
+                 executor: Optional[Executor] = None, source: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None, 
+                 cells: int = FD_CELLS, courant: float = COURANT) -> None:
+        assert 0 < courant <= 1, 'leapfrog is only stable for a dt / dx <= 1'
+        for constraint in (left, right):
+            assert constraint is None or constraint[0] in BOUNDARY_TYPES
+        self.phi = phi
+        self.psi = psi
+        self.a_squared = a_squared
+        self.left = _constraint(left)
+        self.right = _constraint(right)
+        self.source = source
+        self.cells = cells
+        self.courant = courant
+
+    def _grid(self, x: np.ndarray, t_max: float) -> tuple[np.ndarray, np.ndarray]:
+        # a² is probed on the plotted range first to find how far an unconstrained side has to be pushed
+        if callable(self.a_squared):
+            probe = np.asarray(self.a_squared(np.linspace(x.min(), x.max(), self.cells + 1)), dtype=float)
+            reach = np.sqrt(probe.max()) * t_max
+        else:
+            reach = np.sqrt(self.a_squared) * t_max
+        x0 = self.left[1] if self.left is not None else min(x.min(), self.phi.start, self.psi.start) - reach - 1
+        x1 = self.right[1] if self.right is not None else max(x.max(), self.phi.end, self.psi.end) + reach + 1
+        grid = np.linspace(x0, x1, self.cells + 1)
+        a_squared = np.asarray(self.a_squared(grid), dtype=float) if callable(self.a_squared) else np.full(grid.shape, self.a_squared)
+        assert (a_squared > 0).all()
+        return grid, np.broadcast_to(a_squared, grid.shape)
+
+    @STATS.timed('solve (scheme)')
+    def solve(self, x: np.ndarray | list[float], t: np.ndarray | list[float] | float) -> Solution:
+        x, t = np.atleast_1d(np.asarray(x, dtype=float)), np.atleast_1d(np.asarray(t, dtype=float))
+        assert (np.diff(t) >= 0).all() and t[0] >= 0
+        STATS.count('field values', x.size * t.size)
+        grid, a_squared = self._grid(x, t[-1])
+        dx = grid[1] - grid[0]
+        # CFL: the fastest wave may cross at most courant cells per step
+        steps = max(int(np.ceil(t[-1] * np.sqrt(a_squared.max()) / (self.courant * dx))), 1)
+        dt = t[-1] / steps if t[-1] > 0 else 0.0
+        assert dt * np.sqrt(a_squared.max()) <= self.courant * dx * (1 + 1e-12)
+        ratio = a_squared * dt ** 2 / dx ** 2
+
+        # two buffers that trade places every step, and one scratch array for the second difference
+        current = np.asarray(self.phi.evaluate(grid), dtype=float).copy()
+        previous = np.empty_like(current)
+        laplacian = np.empty_like(current)
+        self._boundaries(current)
+
+        def second_difference(u: np.ndarray) -> np.ndarray:
+            np.subtract(u[2:], u[1:-1], out=laplacian[1:-1])
+            laplacian[1:-1] -= u[1:-1]
+            laplacian[1:-1] += u[:-2]
+            laplacian[0] = 2 * (u[1] - u[0]) if self.left is not None and self.left[0] == 'even' else 0.0
+            laplacian[-1] = 2 * (u[-2] - u[-1]) if self.right is not None and self.right[0] == 'even' else 0.0
+            np.multiply(laplacian, ratio, out=laplacian)
+            return laplacian
+
+        # the first step is the Taylor expansion U(dt) = φ + dt ψ + dt²/2 Utt(0)
+        previous[:] = current
+        second_difference(current)
+        next_values = current + dt * self.psi.evaluate(grid) + laplacian / 2
+        if self.source is not None:
+            next_values += dt ** 2 / 2 * self.source(grid, np.zeros(grid.shape))
+        previous, current = current, next_values
+        self._boundaries(current)
+
+        u = np.empty((len(t), len(x)))
+        output = 0
+        for step in range(1, steps + 2):
+            # outputs between steps step - 1 and step are interpolated in time
+            while output < len(t) and t[output] <= step * dt:
+                weight = (t[output] - (step - 1) * dt) / dt if dt > 0 else 0.0
+                u[output] = np.interp(x, grid, (1 - weight) * previous + weight * current)
+                output += 1
+            if output == len(t): break
+            second_difference(current)
+            # U(n+1) = 2 U(n) - U(n-1) + dt² (a² Uxx + f), written over U(n-1)
+            np.subtract(laplacian, previous, out=previous)
+            previous += current
+            previous += current
+            if self.source is not None:
+                previous += dt ** 2 * self.source(grid, np.full(grid.shape, step * dt))
+            previous, current = current, previous
+            self._boundaries(current)
+        a = float(np.sqrt(a_squared.max()))
+        return Solution(x, t, a, None, None, None, None, u_field=u)
+
+    def _boundaries(self, u: np.ndarray) -> None:
+        if self.left is None or self.left[0] == 'odd': u[0] = 0.0
+        if self.right is None or self.right[0] == 'odd': u[-1] = 0.0
+
+    def __call__(self, x: np.ndarray | list[float], t: np.ndarray | list[float] | float) -> np.ndarray:
+        return self.solve(x, t).u
+
+
+SOLVERS = {
+    'analytic': WaveSolver,
+    'finite differences': FiniteDifferenceSolver,
+}
@@ -1,19 +1,22 @@
 from __future__ import annotations
 from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QButtonGroup, QGridLayout, QLabel, QLineEdit, QRadioButton, QSizePolicy
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QButtonGroup, QGridLayout, QLabel, QLineEdit, QRadioButton, QSizePolicy
 from matplotlib.widgets import Slider
 from PyQt5.QtCore import QObject
 from src.plots import Range
+import numpy as np
 
 STANDART_LIMITERS = Range(0, 5, -2, 2)
 MAX_T = 23
+T_STEP = 0.25
+T_VALUES = np.arange(0, MAX_T + T_STEP / 2, T_STEP)
 
 
 class TSlider(QObject):
     valueChanged = pyqtSignal(int)
     def __init__(self, ax, *args, **kwargs) -> None:
         super().__init__()
-        self.slider = Slider(ax, 't', 0, MAX_T, valinit=0, valstep=0.25, valfmt="%.2f")
+        self.slider = Slider(ax, 't', 0, MAX_T, valinit=0, valstep=T_STEP, valfmt="%.2f")
         self.slider.on_changed(lambda _: self.on_changed(self.slider.val))
 
     def on_changed(self, val) -> None:
@@ -110,4 +113,29 @@ class RadioButtons(QWidget):
             return "odd"
         elif self.button_3.isChecked():
             return "even"
-        return "none"
\ No newline at end of file
+        return "none"
+
+
+class SolverChoice(QWidget):
+    solverType = pyqtSignal(str)
+
+    def __init__(self) -> None:
+        super().__init__()
+        main_layout = QHBoxLayout()
+        self.button_group = QButtonGroup()
+        self.button_1 = QRadioButton("d'Alembert")
+        self.button_2 = QRadioButton('Finite differences')
+        self.button_1.setChecked(True)
+        self.button_group.addButton(self.button_1)
+        self.button_group.addButton(self.button_2)
+        self.button_1.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.button_2.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.button_group.buttonClicked.connect(lambda _: self.solverType.emit(self.getType()))
+        main_layout.addWidget(self.button_1)
+        main_layout.addWidget(self.button_2)
+        self.setLayout(main_layout)
+
+    def getType(self) -> str:
+        if self.button_2.isChecked():
+            return 'finite differences'
+        return 'analytic'
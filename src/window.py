@@ -1,12 +1,21 @@
 from __future__ import annotations
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QSizePolicy, QLabel, QLineEdit
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QSizePolicy, QLabel, QLineEdit, QPushButton, QFileDialog, QShortcut, QMessageBox
+from PyQt5.QtGui import QKeySequence
 import matplotlib.pyplot as plt
 import numpy as np
-from src.plots import WavePlot, SinglePlot, ResultPlot, PlotInput
+from src.plots import WavePlot, SinglePlot, ResultPlot, SourcePlot, PlotInput, sample_grid, axes_pixels
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from src.datastructures import Range, Segment, Plot
-from src.widgets import Limiters, RadioButtons, TSlider, MAX_T
-from math import *
+from src.datastructures import Range, Plot, FunctionPlot, reintegrate
+from src.solver import Solution, extend_plot
+from src.problem import Problem
+from src.export import export
+from src.profiling import STATS, HUD
+from src.cache import FieldCache, fingerprint
+from src.graph import Node, Input
+from src.worker import ComputationWorker
+from src.widgets import Limiters, RadioButtons, SolverChoice, TSlider, T_VALUES
+from src.formula import FormulaError, compile_formula, bounded
+from typing import Callable, Optional
 
 
 
@@ -43,6 +52,24 @@ class Window(QWidget):
             'resulting f(x)': None
         }
 
+        # Raw φ, ψ and boundaries of the current problem, and the precomputed U(x, t) fields over the whole t slider
+        self.source_plots = {
+            'φ(x)': None,
+            'ψ(x)': None
+        }
+        self.boundaries = (('none', None), ('none', None))
+        self.formula_plots = {
+            'φ(x)': None,
+            'ψ(x)': None
+        }
+        self.field_cache = FieldCache()
+        self._integrated = (None, None)
+        self.result_plot = None
+        self.source = None
+        self.source_plot = None
+        self.worker = ComputationWorker()
+        self.worker.finished.connect(self.field_computed)
+
         settings_layout = QVBoxLayout()
         main_layout.addLayout(settings_layout, stretch=1)
 
@@ -103,8 +130,8 @@ class Window(QWidget):
         self.a_parameter.editingFinished.connect(self.refresh_resulting_plots)
         second_part = QLabel('Uxx + ')
         self.f_function = QLineEdit('0')
-        self.f_function.setEnabled(False) #! TODOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOOO
-        self.f_function.editingFinished.connect(self.refresh_resulting_plots)
+        self.f_function.setPlaceholderText('f(x, t)')
+        self.f_function.editingFinished.connect(self.refresh_source)
         equation_text_layout.addWidget(first_part, stretch=3)
         equation_text_layout.addWidget(self.a_parameter, stretch=1)
         equation_text_layout.addWidget(second_part, stretch=3)
@@ -114,6 +141,12 @@ class Window(QWidget):
         second_part.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.f_function.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
+        # a² may depend on x, which only the finite-difference solver can take
+        self.solver_choose = SolverChoice()
+        self.solver_choose.solverType.connect(self.refresh_resulting_plots)
+        main_settings_layout.addWidget(self.solver_choose, stretch=1)
+        self.solver_choose.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
         self.t_slider_figure = plt.figure()
         self.t_slider_figure_canvas = FigureCanvasQTAgg(self.t_slider_figure)
         main_settings_layout.addWidget(self.t_slider_figure_canvas, stretch=1)
@@ -165,9 +198,16 @@ class Window(QWidget):
 
 
         # Resulting plots limiters
-        self.resulting_functions_limiter = Limiters(self.refresh_initial_plots)
+        self.resulting_functions_limiter = Limiters(self.refresh_range)
         settings_layout.addWidget(self.resulting_functions_limiter, stretch=1)
 
+        self.export_button = QPushButton('Export animation')
+        self.export_button.clicked.connect(self.export_animation)
+        self.exporter = ComputationWorker()
+        self.exporter.finished.connect(self.export_finished)
+        self.exporter.failed.connect(self.export_finished)
+        settings_layout.addWidget(self.export_button)
+
 
         # Initial plots
         initial_plots_layout = QHBoxLayout()
@@ -209,7 +249,16 @@ class Window(QWidget):
         self.f_plot_figure_canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.result_plot_figure_canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
+        # Performance overlay: ms per stage and frame rate, F3 or WAVE_HUD=1
+        self.hud = QLabel(self.result_plot_figure_canvas)
+        self.hud.setStyleSheet('background-color: rgba(255, 255, 255, 200); font-family: monospace; font-size: 9pt; padding: 2px;')
+        self.hud.move(4, 4)
+        self.hud.setVisible(HUD)
+        QShortcut(QKeySequence('F3'), self, self.toggle_hud)
+
         self.refresh_slider()
+        self.nodes = self._build_graph()
+        self.read_parameters()
         self.refresh_input_plots()
 
         self.function_parameters = {
@@ -234,31 +283,24 @@ class Window(QWidget):
     def draw_initial_plot(self, function_name: str, function: QLabel, figure: plt.Figure, canvas: FigureCanvasQTAgg) -> None:
         assert function_name in self.input_plots.keys()
         self.changeAccessInputPlot()
+        self.formula_plots[function_name] = None
         if function.text() == '':
             return
-        figure.clear()
         max_range = self.functions_limiter.get_limiters(resulting=True)
-        x = np.linspace(max_range.x0, max_range.x1, int(200))
-        evaluation = ['0'] * len(x)
-        if function.text():
-            evaluation = [function.text().replace('x', str(dot)) for dot in x]
-        y = []
-        for dot in range(len(x)):
-            try:
-                y.append(eval(evaluation[dot]))
-            except ZeroDivisionError:
-                if abs(eval(evaluation[dot-1]) - eval(evaluation[(dot+1)%len(evaluation)])) / eval(evaluation[dot-1]) - eval(evaluation[(dot+1)%len(evaluation)]) == 1:
-                    y.append(self.functions_limiter.get_limiters(resulting=True).y1 + 2)
-                else:
-                    y.append(self.functions_limiter.get_limiters(resulting=True).y0 - 2)
-            except SyntaxError:
-                function.setText('')
-                return
-            except NameError:
-                function.setText('')
-                return
+        # nothing is changed until the formula has been evaluated, a bad one only clears the text
+        try:
+            formula = compile_formula(function.text())
+            # the solver keeps the formula itself, the editable vertices only approximate it within tolerance
+            plot = FunctionPlot(bounded(formula, max_range.y0, max_range.y1), max_range.x0, max_range.x1, 
+                                f'{function.text()}|{max_range.y0}|{max_range.y1}')
+            vertices = plot.linearize()
+        except FormulaError:
+            function.setText('')
+            return
+        figure.clear()
+        self.formula_plots[function_name] = plot
         self.input_plots[function_name].clear()
-        self.input_plots[function_name].initial_draw(Plot.fromlists(x, y))
+        self.input_plots[function_name].initial_draw(vertices)
         self.refresh_initial_plots()
         canvas.draw()
 
@@ -272,6 +314,7 @@ class Window(QWidget):
 
 
 
+    @STATS.timed('input plots')
     def refresh_input_plots(self) -> None:
         plot_range = self.functions_limiter.get_limiters()
         self.phi_input_plot_figure.clear()
@@ -292,12 +335,8 @@ class Window(QWidget):
         self.right_x0_parameter.setEnabled('none' != self.right_constraint_choose.getType())
         self.refresh_initial_plots()
 
+    @STATS.timed('initial plots', slot=True)
     def refresh_initial_plots(self) -> None:
-        self.phi_initial_plot_figure.clear()
-        self.psi_initial_plot_figure.clear()
-
-        plot_range = self.resulting_functions_limiter.get_limiters()
-
         left_constraint_type = self.left_constraint_choose.getType()
         right_constraint_type = self.right_constraint_choose.getType()
         left_constraint_x0 = float(self.left_x0_parameter.text().replace(',', '.'))
@@ -305,117 +344,204 @@ class Window(QWidget):
         assert right_constraint_x0 > left_constraint_x0 #TODO
 
         for function_name in ['φ(x)', 'ψ(x)']:
-            self.initial_plots_data[function_name] = self.input_plots[function_name].get_plot()
-
-        if left_constraint_type != 'none':
-            for function_name in ['φ(x)', 'ψ(x)']:
-                self.initial_plots_data[function_name] = self._extend_plot(self.initial_plots_data[function_name], left_constraint_type, left_constraint_x0, 'left')
-        if right_constraint_type != 'none':
-            for function_name in ['φ(x)', 'ψ(x)']:
-                self.initial_plots_data[function_name] = self._extend_plot(self.initial_plots_data[function_name], right_constraint_type, right_constraint_x0, 'right')
-        if left_constraint_type != 'none' and right_constraint_type != 'none':
-            for _ in range(4):
-                for function_name in ['φ(x)', 'ψ(x)']:
-                    self.initial_plots_data[function_name] = self._extend_plot(self.initial_plots_data[function_name], left_constraint_type, left_constraint_x0, 'left')
-                for function_name in ['φ(x)', 'ψ(x)']:
-                    self.initial_plots_data[function_name] = self._extend_plot(self.initial_plots_data[function_name], right_constraint_type, right_constraint_x0, 'right')
-
-        SinglePlot(self.phi_initial_plot_figure, self.phi_initial_plot_figure_canvas, self.initial_plots_data['φ(x)'], plot_range, 'Initial φ(x)', colors=['orange'])
-        self.initial_plots_data['Ф(x)'] = SinglePlot(self.psi_initial_plot_figure, self.psi_initial_plot_figure_canvas, self.initial_plots_data['ψ(x)'], plot_range, 'Initial ψ(x), Ф(x)', lambda plot: plot.integrate(), colors=['black', 'blue']).get_plots()[1]
-
-        self.initialize_resulting_plots()
-
-
-    def _extend_plot(self, plot: Plot, constraint_type: str, constraint_x0: float, side: str) -> Plot:
-        if constraint_type == 'none' or plot is None:
-            return plot
-        reflected_segments = []
-        if constraint_x0 < plot.start:
-            start, function = plot.start, plot(plot.start)
-            plot.segments.insert(0, Segment(constraint_x0, start, lambda _: function)) 
-        if constraint_x0 > plot.end:
-            end, function = plot.end, plot(plot.end)
-            plot.segments.append(Segment(end, constraint_x0, lambda _: function))
-
-        if side == 'left':
-            for segment in plot.segments:
-                if segment.x1 <= constraint_x0:
-                    continue
-                if segment.x0 < constraint_x0 < segment.x1:
-                    segment = Segment(constraint_x0, segment.x1, segment.function)
-
-                reflected_x0 = 2 * constraint_x0 - segment.x1
-                reflected_x1 = 2 * constraint_x0 - segment.x0
-
-                if constraint_type == 'even':
-                    reflected_function = lambda x, seg=segment, cx0=constraint_x0: seg(2 * cx0 - x)
-                else:  # 'odd'
-                    reflected_function = lambda x, seg=segment, cx0=constraint_x0: -seg(2 * cx0 - x)
-
-                reflected_segment = Segment(reflected_x0, reflected_x1, reflected_function)
-                reflected_segments.append(reflected_segment)
-
-            cut_input_segments = [segment for segment in plot.segments if segment.x1 > constraint_x0] 
-            if cut_input_segments[0].x0 < constraint_x0:
-                cut_input_segments[0].x0 = constraint_x0
-
-            all_segments = sorted(reflected_segments + cut_input_segments, key=lambda segment: segment.x0)
-
-            return Plot(all_segments)
-
-        for segment in plot.segments:
-            if segment.x0 >= constraint_x0:
-                continue
-            if segment.x0 < constraint_x0 < segment.x1:
-                segment = Segment(segment.x0, constraint_x0, segment.function)
-            reflected_x0 = 2 * constraint_x0 - segment.x1
-            reflected_x1 = 2 * constraint_x0 - segment.x0
-
-            if constraint_type == 'even':
-                reflected_function = lambda x, seg=segment, cx0=constraint_x0: seg(2 * cx0 - x)
-            else:  # 'odd'
-                reflected_function = lambda x, seg=segment, cx0=constraint_x0: -seg(2 * cx0 - x)
-
-            reflected_segment = Segment(reflected_x0, reflected_x1, reflected_function)
-            reflected_segments.append(reflected_segment)
-
-        cut_input_segments = [segment for segment in plot.segments if segment.x0 < constraint_x0] 
-        if cut_input_segments[-1].x1 > constraint_x0:
-            cut_input_segments[-1].x1 = constraint_x0
-        all_segments = sorted(reflected_segments + cut_input_segments, key=lambda segment: segment.x0)
-        return Plot(all_segments)
+            self.source_plots[function_name] = self.formula_plots[function_name]
+            if self.source_plots[function_name] is None:
+                self.source_plots[function_name] = self.input_plots[function_name].get_plot()
+            self.nodes[function_name].set(self.source_plots[function_name])
+            STATS.set(f'{function_name} segments', max(len(getattr(self.source_plots[function_name], 'x', ())) - 1, 0))
+        self.boundaries = ((left_constraint_type, left_constraint_x0 if left_constraint_type != 'none' else None), 
+                           (right_constraint_type, right_constraint_x0 if right_constraint_type != 'none' else None))
+        self.nodes['left'].set(self.boundaries[0])
+        self.nodes['right'].set(self.boundaries[1])
+        self.refresh_range()
+
+    def refresh_range(self) -> None:
+        self.nodes['range'].set(self.resulting_functions_limiter.get_limiters())
+        self.render()
+
+    @STATS.timed('refresh', slot=True)
+    def refresh_resulting_plots(self) -> None:
+        self.read_parameters()
+        self.render()
+
+    def read_parameters(self) -> None:
+        a_squared = self._a_squared()
+        self.nodes['a²'].set((self.a_parameter.text() if callable(a_squared) else a_squared, a_squared))
+        self.nodes['f(x, t)'].set((self.f_function.text().strip() if self.source is not None else None, self.source))
+        self.nodes['solver'].set(self.solver_choose.getType())
+        self.nodes['t'].set(self.t_slider.val())
+
+    def _build_graph(self) -> dict[str, Node]:
+        # raw φ, ψ -> extended by the constraints -> Ф -> the shifted terms and U over the t slider -> the frame at t.
+        # Every parameter invalidates only the nodes built on it: moving t redraws the frame, the range redraws
+        # the views and samples the field again, but φ, ψ are only extended and integrated when they or the constraints change
+        nodes = {name: Input(name, key=fingerprint) for name in ['φ(x)', 'ψ(x)']}
+        nodes.update({name: Input(name, value) for name, value in [('left', ('none', None)), ('right', ('none', None)), 
+                ('range', None), ('solver', 'analytic'), ('t', 0.0), ('pixels', 0)]})
+        nodes['a²'] = Input('a²', (1.0, 1.0), key=lambda value: value[0])
+        nodes['f(x, t)'] = Input('f(x, t)', (None, None), key=lambda value: value[0])
+        for name in ['φ(x)', 'ψ(x)']:
+            nodes[f'extended {name}'] = Node(f'extended {name}', self._extend_plot, nodes[name], nodes['left'], nodes['right'])
+        nodes['Ф(x)'] = Node('Ф(x)', self._integrate, nodes['extended ψ(x)'])
+        nodes['initial φ(x)'] = Node('initial φ(x)', self._draw_initial_phi, nodes['extended φ(x)'], nodes['range'])
+        nodes['initial ψ(x)'] = Node('initial ψ(x)', self._draw_initial_psi, nodes['extended ψ(x)'], nodes['Ф(x)'], nodes['range'])
+        nodes['resulting plots'] = Node('resulting plots', self.initialize_resulting_plots, 
+                                        nodes['extended φ(x)'], nodes['Ф(x)'], nodes['range'])
+        nodes['field'] = Node('field', self._field, nodes['φ(x)'], nodes['ψ(x)'], nodes['extended φ(x)'], nodes['Ф(x)'], nodes['a²'], 
+                              nodes['left'], nodes['right'], nodes['range'], nodes['f(x, t)'], nodes['solver'], nodes['pixels'])
+        nodes['frame'] = Node('frame', self._show_frame, nodes['field'], nodes['t'], nodes['range'], nodes['f(x, t)'], 
+                              nodes['resulting plots'])
+        return nodes
+
+    def render(self) -> None:
+        computations = sum(node.computations for node in self.nodes.values())
+        self.nodes['initial φ(x)'].value
+        self.nodes['initial ψ(x)'].value
+        self.nodes['resulting plots'].value
+        self.nodes['pixels'].set(axes_pixels(self.result_plot.ax)[0])
+        self.nodes['frame'].value
+        STATS.set('nodes computed', sum(node.computations for node in self.nodes.values()) - computations)
+        self.initial_plots_data.update({name: self.nodes[f'extended {name}'].value for name in ['φ(x)', 'ψ(x)']})
+        self.initial_plots_data['Ф(x)'] = self.nodes['Ф(x)'].value
+
+
+    def _integrate(self, plot: Plot) -> Plot:
+        # an edit of ψ is integrated from the previous Ф, over the changed segments only
+        with STATS.stage('integrate'):
+            self._integrated = plot, reintegrate(plot, *self._integrated)
+            return self._integrated[1]
+
+    @STATS.timed('extend')
+    def _extend_plot(self, plot: Plot, left: tuple[str, Optional[float]], right: tuple[str, Optional[float]]) -> Plot:
+        return extend_plot(plot, left, right)
+
+    def _draw_initial_phi(self, phi: Plot, plot_range: Range) -> SinglePlot:
+        self.phi_initial_plot_figure.clear()
+        return SinglePlot(self.phi_initial_plot_figure, self.phi_initial_plot_figure_canvas, phi, plot_range, 'Initial φ(x)', colors=['orange'])
+
+    def _draw_initial_psi(self, psi: Plot, Phi: Plot, plot_range: Range) -> SinglePlot:
+        self.psi_initial_plot_figure.clear()
+        return SinglePlot(self.psi_initial_plot_figure, self.psi_initial_plot_figure_canvas, psi, plot_range, 'Initial ψ(x), Ф(x)', 
+                          lambda plot: Phi, colors=['black', 'blue'])
 
     
-    def initialize_resulting_plots(self) -> None:
+    @STATS.timed('resulting plots')
+    def initialize_resulting_plots(self, phi: Plot, Phi: Plot, plot_range: Range) -> ResultPlot:
         self.phi_plot_figure.clear()
         self.psi_plot_figure.clear()
         self.f_plot_figure.clear()
         self.result_plot_figure.clear()
 
         self.resulting_plots['resulting φ(x)'] = WavePlot(self.phi_plot_figure, self.phi_plot_figure_canvas, \
-                self.initial_plots_data['φ(x)'], 'Resulting φ(x)', lambda plot1, plot2, a: 1/2 * (plot1 + plot2), colors=['red', 'yellow', 'orange'])
+                phi, 'Resulting φ(x)', lambda plot1, plot2, a: 1/2 * (plot1 + plot2), colors=['red', 'yellow', 'orange'])
         self.resulting_plots['resulting Ф(x)'] = WavePlot(self.psi_plot_figure, self.psi_plot_figure_canvas, \
-                self.initial_plots_data['Ф(x)'], 'Resulting Фx)', lambda plot1, plot2, a: (1/(2 * a)) * (plot2 - plot1), colors=['violet', 'cyan', 'blue'])
-        # self.resulting_plots['resulting f(x, t)'] = WavePlot(self.f_plot_figure,     self.f_plot_figure_canvas, \
-        #         self.initial_plots_data['f(x)'], 'Resulting f(x, t)', lambda plot1, plot2: plot1 - plot2, colors=['blue', 'red', 'green']).get_plots()[2]
+                Phi, 'Resulting Фx)', lambda plot1, plot2, a: (1/(2 * a)) * (plot2 - plot1), colors=['violet', 'cyan', 'blue'])
+        self.source_plot = SourcePlot(self.f_plot_figure, self.f_plot_figure_canvas, 'f(x, t), Duhamel term')
+        self.result_plot = ResultPlot(self.result_plot_figure, self.result_plot_figure_canvas, \
+                self.resulting_plots['resulting φ(x)'].get_plots()[2], self.resulting_plots['resulting Ф(x)'].get_plots()[2], 
+                plot_range, 'Result', lambda plot1, plot2: plot1 + plot2, colors=['orange', 'blue', 'green'])
+        return self.result_plot
+
+    def _field(self, phi: Plot, psi: Plot, extended_phi: Plot, Phi: Plot, a_squared: tuple, left: tuple, right: tuple, 
+               plot_range: Range, source: tuple, solver: str, pixels: int) -> Optional[Solution]:
+        # a cache miss goes to the worker and leaves the frame empty until field_computed invalidates this node;
+        # the d'Alembert formula takes the extended φ and the (incrementally integrated) Ф of the nodes above
+        problem = Problem(phi, psi, a_squared[1], left if left[0] != 'none' else None, right if right[0] != 'none' else None, 
+                          plot_range, source[1], solver, (extended_phi, Phi))
+        key = (fingerprint(phi), fingerprint(psi), a_squared[0], problem.method, left, right, plot_range.x0, plot_range.x1, pixels, source[0])
+        field = self.field_cache.get(key)
+        if field is None:
+            x = sample_grid(plot_range, pixels)
+            self.worker.submit(key, lambda: problem.solve(x, T_VALUES))
+        return field
+
+    def _show_frame(self, field: Optional[Solution], t: float, plot_range: Range, source: tuple, result_plot: ResultPlot) -> None:
+        if field is None:
+            return
+        source = source[1]
+        row = field.row(field.index(t))
+        if not field.analytic:
+            nothing = np.full(field.x.shape, np.nan)
+            result_plot.show(plot_range, field.x, nothing, nothing, row.u[0])
+            self.source_plot.show(plot_range, field.x, 
+                                  nothing if source is None else source(field.x, t), nothing)
+            self._frame_shown()
+            return
+        phi_term = self.resulting_plots['resulting φ(x)'].show(plot_range, field.a, t, field.x, 
+                row.phi_minus[0], row.phi_plus[0], row.phi_term[0])
+        psi_term = self.resulting_plots['resulting Ф(x)'].show(plot_range, field.a, t, field.x, 
+                row.Phi_minus[0], row.Phi_plus[0], row.psi_term[0])
+        if field.f_term is None:
+            result_plot.show(plot_range, field.x, row.phi_term[0], row.psi_term[0], row.u[0], phi_term, psi_term)
+            self.source_plot.show(plot_range, field.x, np.zeros(field.x.shape), np.zeros(field.x.shape))
+        else:
+            result_plot.show(plot_range, field.x, row.phi_term[0], row.psi_term[0], row.u[0])
+            self.source_plot.show(plot_range, field.x, source(field.x, t), row.f_term[0])
+        self._frame_shown()
+
+    def _frame_shown(self) -> None:
+        STATS.frame()
+        if not self.hud.isHidden():
+            self.hud.setText(STATS.text())
+            self.hud.adjustSize()
+
+    def toggle_hud(self) -> None:
+        self.hud.setVisible(self.hud.isHidden())
+        self._frame_shown()
+
+    def refresh_source(self) -> None:
+        text = self.f_function.text().strip()
+        try:
+            self.source = None if text in ('', '0') else compile_formula(text, ('x', 't'))
+        except FormulaError:
+            self.f_function.setText('0')
+            self.source = None
         self.refresh_resulting_plots()
 
-    def refresh_resulting_plots(self) -> None:
-        self.result_plot_figure.clear()
-
-        plot_range = self.resulting_functions_limiter.get_limiters()
-        a = float(self.a_parameter.text().replace(',', '.'))
-        assert a > 0
-        a = a ** 0.5
-        t = self.t_slider.val()
-
-        for function_name in ['φ(x)', 'Ф(x)']:
-            self.resulting_plots[f'resulting {function_name}'].refresh(a, t, plot_range)
-            self.resulting_plots_data[f'resulting {function_name}'] = self.resulting_plots[f'resulting {function_name}'].get_plots()[2]
-        ResultPlot(self.result_plot_figure, self.result_plot_figure_canvas, \
-                self.resulting_plots_data['resulting φ(x)'], self.resulting_plots_data['resulting Ф(x)'], 
-                plot_range, 'Result', lambda plot1, plot2: plot1 + plot2, colors=['orange', 'blue', 'green'])
-        
+    @STATS.timed('field received')
+    def field_computed(self, key: tuple, field: Solution) -> None:
+        self.field_cache.put(key, field)
+        self.nodes['field'].invalidate()
+        self.render()
+
+    def _a_squared(self) -> float | Callable[[np.ndarray], np.ndarray]:
+        text = self.a_parameter.text().replace(',', '.')
+        try:
+            a_squared = float(text)
+        except ValueError:
+            try:
+                return compile_formula(text)
+            except FormulaError:
+                self.a_parameter.setText('1')
+                return 1.0
+        assert a_squared > 0
+        return a_squared
+
+    def problem(self, a_squared: Optional[float | Callable[[np.ndarray], np.ndarray]] = None) -> Problem:
+        left, right = self.boundaries
+        return Problem(self.source_plots['φ(x)'], self.source_plots['ψ(x)'], self._a_squared() if a_squared is None else a_squared, 
+                       left if left[0] != 'none' else None, right if right[0] != 'none' else None, 
+                       self.resulting_functions_limiter.get_limiters(), self.source, self.solver_choose.getType())
+
+    def export_animation(self) -> None:
+        output, _ = QFileDialog.getSaveFileName(self, 'Export animation', 'wave.gif', 'GIF (*.gif);;MP4 (*.mp4);;PNG frames (*)')
+        if not output:
+            return
+        # the problem is read from the widgets here, the frames are rendered off the GUI thread
+        problem = self.problem()
+        self.export_button.setEnabled(False)
+        self.export_button.setText('Exporting...')
+        self.exporter.submit(output, lambda: export(problem, output, T_VALUES))
+
+    def export_finished(self, output: str, result: str | Exception) -> None:
+        self.export_button.setEnabled(True)
+        self.export_button.setText('Export animation')
+        if isinstance(result, Exception):
+            QMessageBox.warning(self, 'Export failed', f'{output}: {type(result).__name__}: {result}')
+        elif result != output:
+            QMessageBox.information(self, 'Export finished', f'ffmpeg not found, frames written to {result}')
+        else:
+            QMessageBox.information(self, 'Export finished', f'Written to {result}')
 
     def changeAccessInputPlot(self):
         for key, plot in self.input_plots.items():
@@ -0,0 +1,57 @@
+from __future__ import annotations
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class ComputationWorker(QObject):
+    # Runs one job at a time off the GUI thread. While a job is running, new requests only replace the
+    # pending one, and a result is published only if it belongs to the newest request.
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+    _completed = pyqtSignal(object, object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._running: Optional[Hashable] = None
+        self._pending: Optional[tuple[Hashable, Callable[[], Any]]] = None
+        self._latest: Optional[Hashable] = None
+        self._completed.connect(self._on_completed)
+
+    def submit(self, key: Hashable, compute: Callable[[], Any]) -> None:
+        self._latest = key
+        if self._running is None:
+            self._start(key, compute)
+        elif self._running != key:
+            self._pending = (key, compute)
+        else:
+            self._pending = None
+
+    @property
+    def busy(self) -> bool:
+        return self._running is not None
+
+    def _start(self, key: Hashable, compute: Callable[[], Any]) -> None:
+        self._running = key
+        future = self._pool.submit(compute)
+        future.add_done_callback(lambda future: self._completed.emit(key, future))
+
+    def _on_completed(self, key: Hashable, future: Future) -> None:
+        self._running = None
+        if self._pending is not None:
+            self._start(*self._pending)
+            self._pending = None
+        error = future.exception()
+        if error is not None:
+            traceback.print_exception(type(error), error, error.__traceback__)
+            if key == self._latest:
+                self.failed.emit(key, error)
+            return
+        if key == self._latest:
+            self.finished.emit(key, future.result())
+
+    def shutdown(self) -> None:
+        self._pending = None
+        self._pool.shutdown(wait=False)